@@ -1,11 +1,35 @@
-import streamlit as st
+import time
+_module_started = time.perf_counter()
+
 from datetime import datetime, timedelta
 import base64
-from PIL import Image
+import bisect
+import csv
+import hashlib
+import heapq
+import html
+import importlib
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
 import random
 import io
-import pandas as pd
-import numpy as np
+import sqlite3
+import string
+import sys
+import tempfile
+import types
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import queue
+import threading
+import uuid
+import weakref
 
 # Import the classes from datamodel
 from datetime import datetime, timedelta
@@ -13,8 +37,108 @@ from typing import List, Tuple, Optional
 import random
 import base64
 
+logger = logging.getLogger(__name__)
+
+class _LazyModule(types.ModuleType):
+    """Stands in for a module until its first attribute access, then imports it"""
+    def __getattr__(self, attr):
+        # A regular import, so the import system's per-module locks make a
+        # first use racing the warm-up thread wait for the import to finish
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def _lazy_import(name: str):
+    """Return a module that is only actually imported on first attribute access"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
+
+# Heavy modules are loaded by the first page or worker that needs them
+st = _lazy_import("streamlit")
+Image = _lazy_import("PIL.Image")
+ImageOps = _lazy_import("PIL.ImageOps")
+pd = _lazy_import("pandas")
+np = _lazy_import("numpy")
+
+# Streamlit re-executes this script on every rerun, so module globals are
+# rebuilt each time. Process-wide resources (stores, models, timings) are
+# kept in a namespace registered in sys.modules, which survives reruns.
+_process = sys.modules.get("_receipt_app_process")
+if _process is None:
+    _process = types.ModuleType("_receipt_app_process")
+    _process.resources = {}
+    _process.resource_locks = {}
+    _process.timings = {}  # Name to seconds spent importing or initializing
+    _process.warm_up_started = False
+    _process.lock = threading.Lock()
+    sys.modules["_receipt_app_process"] = _process
+
+def get_process_resource(name: str, factory):
+    """Create a process-wide resource on first use, recording how long it took"""
+    resources = _process.resources
+    if name not in resources:
+        with _process.resource_locks.setdefault(name, threading.Lock()):
+            if name not in resources:
+                started = time.perf_counter()
+                resources[name] = factory()
+                _process.timings[name] = time.perf_counter() - started
+                logger.info("Initialized %s in %.2fs", name, _process.timings[name])
+    return resources[name]
+
+class IngredientVocabulary:
+    """
+    Interns ingredient names to small integer IDs, so entities can keep
+    their ingredients as compact int arrays instead of lists of strings.
+    IDs are only meaningful within one process.
+    """
+    def __init__(self):
+        self._ids = {}  # Map name to ID
+        self._names = []  # Map ID to name
+        self._lock = threading.Lock()
+    
+    def intern(self, name: str) -> int:
+        ingredient_id = self._ids.get(name)
+        if ingredient_id is None:
+            with self._lock:
+                ingredient_id = self._ids.get(name)
+                if ingredient_id is None:
+                    ingredient_id = len(self._names)
+                    self._names.append(name)
+                    self._ids[name] = ingredient_id
+        return ingredient_id
+    
+    def lookup(self, name: str) -> Optional[int]:
+        """The ID of a known name, or None. Unlike intern, never adds the name."""
+        return self._ids.get(name)
+    
+    def encode(self, names) -> array:
+        return array("I", [self.intern(name) for name in names])
+    
+    def decode(self, ids) -> Tuple[str, ...]:
+        names = self._names
+        return tuple(names[ingredient_id] for ingredient_id in ids)
+    
+    def __len__(self):
+        return len(self._names)
+
+# Shared across reruns so IDs held by session objects stay valid
+INGREDIENTS = get_process_resource("ingredient_vocabulary", IngredientVocabulary)
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _to_microseconds(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+def _from_microseconds(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
 class Customer:
-    def __init__(self, customer_id: str, email: str, birthdate: datetime, gender: str, address: str, favorite_food: List[str] = None):
+    __slots__ = ("customer_id", "email", "birthdate", "gender", "address", "_favorite_food", "purchase_history",
+                 "location")
+    
+    def __init__(self, customer_id: str, email: str, birthdate: datetime, gender: str, address: str, favorite_food: List[str] = None,
+                 location: Optional[Tuple] = None):
         self.customer_id = customer_id
         self.email = email
         self.birthdate = birthdate
@@ -22,6 +146,16 @@ class Customer:
         self.address = address
         self.favorite_food = favorite_food if favorite_food is not None else []
         self.purchase_history = []
+        self.location = location  # (lat, lon), if the customer shared it
+    
+    @property
+    def favorite_food(self) -> Tuple[str, ...]:
+        """Decoded on every access, so it is a tuple; assign a new list to change it"""
+        return INGREDIENTS.decode(self._favorite_food)
+    
+    @favorite_food.setter
+    def favorite_food(self, favorite_food: List[str]):
+        self._favorite_food = INGREDIENTS.encode(favorite_food)
     
     def to_dict(self):
         return {
@@ -30,7 +164,8 @@ class Customer:
             "birthdate": self.birthdate.isoformat(),
             "gender": self.gender,
             "address": self.address,
-            "favorite_food": self.favorite_food
+            "favorite_food": list(self.favorite_food),
+            "location": list(self.location) if self.location else None
         }
     
     @classmethod
@@ -41,33 +176,173 @@ class Customer:
             birthdate=datetime.fromisoformat(data["birthdate"]),
             gender=data["gender"],
             address=data["address"],
-            favorite_food=data["favorite_food"]
+            favorite_food=data["favorite_food"],
+            location=tuple(data["location"]) if data.get("location") else None
         )
 
+class BlobStore:
+    """
+    Content-addressed storage for receipt images. Blobs are keyed by the
+    SHA-256 of their bytes, so duplicate uploads share one blob. Blobs are
+    kept as files under root, or in memory when root is None.
+    """
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self._blobs = {}  # Map digest to bytes when there is no root directory
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+    
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if self.root is None:
+            self._blobs.setdefault(digest, data)
+            return digest
+        
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial blob
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+                f.write(data)
+            os.replace(f.name, path)
+        return digest
+    
+    def get(self, digest: str) -> Optional[bytes]:
+        if self.root is None:
+            return self._blobs.get(digest)
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+def get_blob_store() -> BlobStore:
+    """Return the process-wide blob store, created on first use"""
+    return get_process_resource("blob_store", lambda: BlobStore(os.environ.get("RECEIPT_BLOB_DIR", ".receipt_blobs")))
+
+def set_blob_store(store: BlobStore):
+    _process.resources["blob_store"] = store
+
+THUMBNAIL_SIZES = (150, 300)  # Longest side in pixels; 300 is used for high-density screens
+
+def make_thumbnails(image_data: bytes, sizes=THUMBNAIL_SIZES) -> dict:
+    """Downscale an image into a pyramid of JPEG thumbnails, returning a map of size to bytes"""
+    image = Image.open(io.BytesIO(image_data))
+    # Let the JPEG decoder skip detail we are about to throw away
+    image.draft("RGB", (max(sizes), max(sizes)))
+    # Phone photos are stored sideways with an EXIF orientation; the saved JPEG keeps no EXIF
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    
+    thumbnails = {}
+    for size in sorted(sizes, reverse=True):
+        # Each level is derived from the previous, larger one
+        image.thumbnail((size, size))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
 class Receipt:
+    __slots__ = ("receipt_id", "upload_date", "image_ref", "thumbnail_refs", "ocr_text", "_ingredients",
+                 "quantity", "shelf_life", "_expiry_ids", "_expiry_times", "entities", "version")
+    
     def __init__(self, receipt_id: str, upload_date: datetime, image_data: bytes, 
-                 ocr_text: str, ingredients: List[str], quantity: int, shelf_life: datetime):
+                 ocr_text: str, ingredients: List[str], quantity: int, shelf_life: datetime,
+                 image_ref: Optional[str] = None, thumbnail_refs: Optional[dict] = None,
+                 entities: Optional[List[dict]] = None, ingredient_expiry: Optional[dict] = None, version: int = 0):
         self.receipt_id = receipt_id
         self.upload_date = upload_date
-        self.image_data = image_data
+        self.image_ref = image_ref  # Blob store digest of the receipt image
+        self.thumbnail_refs = thumbnail_refs if thumbnail_refs is not None else {}  # Map size to digest
+        if image_data:
+            self.image_data = image_data
         self.ocr_text = ocr_text
         self.ingredients = ingredients
         self.quantity = quantity
-        self.shelf_life = shelf_life
+        self.shelf_life = shelf_life  # Earliest expiry of the receipt's ingredients
+        self.ingredient_expiry = ingredient_expiry if ingredient_expiry is not None else {}  # Map ingredient to expiry
+        self.entities = entities if entities is not None else []  # Products, quantities and prices
+        self.version = version  # Incremented by ReceiptSystem whenever the receipt changes
+    
+    @property
+    def ingredients(self) -> Tuple[str, ...]:
+        """Decoded on every access, so it is a tuple; assign a new list to change it"""
+        return INGREDIENTS.decode(self._ingredients)
+    
+    @ingredients.setter
+    def ingredients(self, ingredients: List[str]):
+        self._ingredients = INGREDIENTS.encode(ingredients)
+    
+    @property
+    def ingredient_ids(self) -> array:
+        return self._ingredients
+    
+    @property
+    def ingredient_expiry(self) -> dict:
+        """Map ingredient to expiry, rebuilt from the packed ID and timestamp arrays"""
+        if self._expiry_ids is None:
+            return {}
+        return dict(zip(INGREDIENTS.decode(self._expiry_ids), map(_from_microseconds, self._expiry_times)))
+    
+    @ingredient_expiry.setter
+    def ingredient_expiry(self, ingredient_expiry: dict):
+        if not ingredient_expiry:
+            self._expiry_ids = self._expiry_times = None
+            return
+        self._expiry_ids = INGREDIENTS.encode(ingredient_expiry)
+        self._expiry_times = array("q", map(_to_microseconds, ingredient_expiry.values()))
+    
+    @property
+    def image_data(self) -> Optional[bytes]:
+        """Image bytes, loaded from the blob store on access"""
+        return get_blob_store().get(self.image_ref) if self.image_ref else None
+    
+    @image_data.setter
+    def image_data(self, image_data: Optional[bytes]):
+        self.image_ref = get_blob_store().put(image_data) if image_data else None
+        self.thumbnail_refs = {}
+    
+    def create_thumbnails(self, sizes=THUMBNAIL_SIZES):
+        """Generate downscaled previews of the receipt image and keep them in the blob store"""
+        image_data = self.image_data
+        if not image_data:
+            return
+        try:
+            thumbnails = make_thumbnails(image_data, sizes)
+        except OSError:
+            return  # Not an image PIL can decode
+        store = get_blob_store()
+        for size, thumbnail in thumbnails.items():
+            self.thumbnail_refs[size] = store.put(thumbnail)
+    
+    def get_thumbnail(self, size: int = THUMBNAIL_SIZES[0]) -> Optional[bytes]:
+        if size not in self.thumbnail_refs and self.image_ref:
+            # Receipts uploaded before thumbnails existed
+            self.create_thumbnails()
+        thumbnail_ref = self.thumbnail_refs.get(size)
+        return get_blob_store().get(thumbnail_ref) if thumbnail_ref else None
     
     def to_dict(self):
         return {
             "receipt_id": self.receipt_id,
             "upload_date": self.upload_date.isoformat(),
-            "image_data": base64.b64encode(self.image_data).decode('utf-8') if self.image_data else None,
+            "image_ref": self.image_ref,
+            "thumbnails": {str(size): ref for size, ref in self.thumbnail_refs.items()},
             "ocr_text": self.ocr_text,
-            "ingredients": self.ingredients,
+            "ingredients": list(self.ingredients),
             "quantity": self.quantity,
-            "shelf_life": self.shelf_life.isoformat()
+            "shelf_life": self.shelf_life.isoformat(),
+            "ingredient_expiry": {ingredient: expiry.isoformat() for ingredient, expiry in self.ingredient_expiry.items()},
+            "entities": self.entities,
+            "version": self.version
         }
     
     @classmethod
     def from_dict(cls, data):
+        # Older snapshots stored the image inline as base64
         image_data = base64.b64decode(data["image_data"]) if data.get("image_data") else None
         return cls(
             receipt_id=data["receipt_id"],
@@ -76,24 +351,49 @@ class Receipt:
             ocr_text=data["ocr_text"],
             ingredients=data["ingredients"],
             quantity=data["quantity"],
-            shelf_life=datetime.fromisoformat(data["shelf_life"])
+            shelf_life=datetime.fromisoformat(data["shelf_life"]),
+            image_ref=data.get("image_ref"),
+            thumbnail_refs={int(size): ref for size, ref in data.get("thumbnails", {}).items()},
+            entities=data.get("entities", []),
+            ingredient_expiry={
+                ingredient: datetime.fromisoformat(expiry)
+                for ingredient, expiry in data.get("ingredient_expiry", {}).items()
+            },
+            version=data.get("version", 0)
         )
 
 class MenuItem:
+    __slots__ = ("item_id", "name", "_ingredients", "price")
+    
     def __init__(self, item_id: str, name: str, ingredients: List[str], price: float):
         self.item_id = item_id
         self.name = name
         self.ingredients = ingredients
         self.price = price
     
+    @property
+    def ingredients(self) -> Tuple[str, ...]:
+        """Decoded on every access, so it is a tuple; assign a new list to change it"""
+        return INGREDIENTS.decode(self._ingredients)
+    
+    @ingredients.setter
+    def ingredients(self, ingredients: List[str]):
+        self._ingredients = INGREDIENTS.encode(ingredients)
+    
+    @property
+    def ingredient_ids(self) -> array:
+        return self._ingredients
+    
     def match_ingredients(self, ingredients: List[str]) -> bool:
-        return any(ingredient in self.ingredients for ingredient in ingredients)
+        # Query names are looked up, not interned, so searches can't grow the vocabulary
+        own_ingredients = set(self._ingredients)
+        return any(INGREDIENTS.lookup(ingredient) in own_ingredients for ingredient in ingredients)
     
     def to_dict(self):
         return {
             "item_id": self.item_id,
             "name": self.name,
-            "ingredients": self.ingredients,
+            "ingredients": list(self.ingredients),
             "price": self.price
         }
     
@@ -107,6 +407,8 @@ class MenuItem:
         )
 
 class Store:
+    __slots__ = ("store_id", "name", "location", "menu_items")
+    
     def __init__(self, store_id: str, name: str, location: Tuple, menu_items: List[MenuItem]):
         self.store_id = store_id
         self.name = name
@@ -134,106 +436,2131 @@ class Store:
             menu_items=menu_items
         )
 
-class ReceiptSystem:
+# Canonical ingredient -> aliases (English and Thai) that may appear on receipts.
+# Extended at runtime from the CSV file named by INGREDIENT_LEXICON_PATH.
+INGREDIENT_LEXICON = {
+    "beef": ["beef", "ground beef", "เนื้อวัว", "เนื้อบด", "เนื้อสันใน"],
+    "chicken": ["chicken", "chicken breast", "chicken thigh", "ไก่", "อกไก่", "สะโพกไก่", "น่องไก่"],
+    "pork": ["pork", "minced pork", "หมู", "หมูสับ", "หมูสามชั้น", "สันคอหมู"],
+    "fish": ["fish", "salmon", "tuna", "ปลา", "ปลาแซลมอน", "ปลาทูน่า"],
+    "shrimp": ["shrimp", "prawn", "prawns", "กุ้ง"],
+    "lettuce": ["lettuce", "iceberg lettuce", "ผักกาดหอม"],
+    "tomato": ["tomato", "tomatoes", "cherry tomato", "มะเขือเทศ"],
+    "vegetables": ["vegetables", "mixed vegetables", "ผัก", "ผักรวม"],
+    "cheese": ["cheese", "cheddar", "mozzarella", "ชีส"],
+    "bread": ["bread", "white bread", "ขนมปัง", "ขนมปังแผ่น"],
+    "dough": ["dough", "pizza dough", "แป้งโด"],
+    "milk": ["milk", "fresh milk", "uht milk", "นม", "นมสด", "นมจืด"],
+    "cultures": ["cultures", "yogurt", "yoghurt", "โยเกิร์ต"],
+    "eggs": ["egg", "eggs", "ไข่", "ไข่ไก่", "ไข่เป็ด"],
+    "rice": ["rice", "jasmine rice", "ข้าว", "ข้าวสาร", "ข้าวหอมมะลิ"],
+    "pasta": ["pasta", "spaghetti", "penne", "พาสต้า", "สปาเก็ตตี้"],
+}
+
+def load_ingredient_lexicon(path: str) -> dict:
+    """Read a UTF-8 CSV of alias,canonical rows into a canonical -> aliases dict"""
+    lexicon = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[0].strip():
+                lexicon.setdefault(row[1].strip(), []).append(row[0].strip())
+    return lexicon
+
+class IngredientMatcher:
+    """
+    Finds ingredient aliases in receipt text. Text and aliases are split into
+    words with pythainlp (which handles Thai, written without spaces, as well
+    as English) and aliases are compiled into an Aho-Corasick automaton over
+    words, so matching is linear in the length of the receipt no matter how
+    large the lexicon is.
+    """
+    def __init__(self, lexicon: dict):
+        from pythainlp.corpus import thai_words
+        from pythainlp.util import dict_trie
+        
+        aliases = {alias.casefold(): canonical for canonical, names in lexicon.items() for alias in names}
+        # Teach the tokenizer the Thai aliases so they aren't split differently in context.
+        # English words are split on spaces already, and adding them would make newmm
+        # break longer words apart (e.g. "eggplant" into "egg" "plant").
+        thai_aliases = {alias for alias in aliases if any("\u0e00" <= char <= "\u0e7f" for char in alias)}
+        self._dictionary = dict_trie(set(thai_words()) | thai_aliases)
+        
+        self._goto = [{}]  # state -> {word: state}
+        self._fail = [0]
+        self._output = [[]]  # state -> [(alias word count, canonical)]
+        for alias, canonical in aliases.items():
+            words = self.tokenize(alias)
+            if words:
+                self._add(words, canonical)
+        self._build_failure_links()
+    
+    def tokenize(self, text: str) -> List[str]:
+        from pythainlp.tokenize import word_tokenize
+        
+        words = word_tokenize(text.casefold(), custom_dict=self._dictionary, engine="newmm", keep_whitespace=False)
+        words = (word.strip(string.punctuation + string.whitespace) for word in words)
+        return [word for word in words if word]
+    
+    def extract(self, text: str) -> List[str]:
+        """Return the canonical ingredients mentioned in text, in order of first appearance"""
+        matches = []  # (start, end, canonical) in word positions
+        state = 0
+        for position, word in enumerate(self.tokenize(text)):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for length, canonical in self._output[state]:
+                matches.append((position - length + 1, position + 1, canonical))
+        
+        # Keep the leftmost-longest non-overlapping matches, so "fresh milk" wins over "milk"
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        ingredients = []
+        covered_until = 0
+        for start, end, canonical in matches:
+            if start >= covered_until:
+                covered_until = end
+                if canonical not in ingredients:
+                    ingredients.append(canonical)
+        return ingredients
+    
+    def _add(self, words: List[str], canonical: str):
+        state = 0
+        for word in words:
+            if word not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][word] = len(self._goto) - 1
+            state = self._goto[state][word]
+        self._output[state].append((len(words), canonical))
+    
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for word, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(word, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+class ReceiptEntityExtractor:
+    """
+    Token classification model that tags products, quantities and prices in
+    receipt text. Text longer than max_length tokens is split into
+    overlapping windows, and windows from many receipts are run through the
+    model batch_size at a time. With quantize=True the linear layers are
+    converted to dynamic int8 for faster CPU inference.
+    """
+    def __init__(self, model_name: str, quantize: bool = False, max_length: int = 256,
+                 stride: Optional[int] = None, batch_size: int = 8):
+        import torch
+        from transformers import AutoModelForTokenClassification, AutoTokenizer
+        
+        # A fast tokenizer is needed for offset mappings and overflowing windows
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        model = AutoModelForTokenClassification.from_pretrained(model_name)
+        model.eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.max_length = max_length
+        self.stride = stride if stride is not None else max_length // 8  # Tokens shared by adjacent windows
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # Sessions share the model; run one batch at a time
+    
+    def extract_batch(self, texts: List[str]) -> List[List[dict]]:
+        """Return a list of entities per text, each a dict with label, text, start, end and score"""
+        import torch
+        
+        if not texts:
+            return []
+        encodings = self.tokenizer(
+            texts, truncation=True, max_length=self.max_length, stride=self.stride,
+            return_overflowing_tokens=True, return_offsets_mapping=True,
+            padding=True, return_tensors="pt"
+        )
+        window_texts = encodings.pop("overflow_to_sample_mapping").tolist()
+        offsets = encodings.pop("offset_mapping").tolist()
+        
+        entities = [{} for _ in texts]  # Per text, map (start, end, label) to entity
+        for start in range(0, len(window_texts), self.batch_size):
+            batch = {name: tensor[start:start + self.batch_size] for name, tensor in encodings.items()}
+            with self._lock, torch.inference_mode():
+                probabilities = self.model(**batch).logits.softmax(dim=-1)
+            scores, labels = probabilities.max(dim=-1)
+            for row in range(len(labels)):
+                window = start + row
+                text_index = window_texts[window]
+                for entity in self._merge_tokens(texts[text_index], offsets[window],
+                                                 labels[row].tolist(), scores[row].tolist()):
+                    # Overlapping windows find the same entity twice
+                    entities[text_index].setdefault((entity["start"], entity["end"], entity["label"]), entity)
+        
+        return [sorted(found.values(), key=lambda entity: entity["start"]) for found in entities]
+    
+    def _merge_tokens(self, text: str, offsets: List[list], labels: List[int], scores: List[float]) -> List[dict]:
+        """Join consecutive B-/I- tagged tokens into entity spans"""
+        id2label = self.model.config.id2label
+        spans = []
+        current = None
+        for (token_start, token_end), label_id, score in zip(offsets, labels, scores):
+            if token_start == token_end:
+                continue  # Special and padding tokens
+            tag = id2label[label_id]
+            prefix, _, label = tag.partition("-") if "-" in tag else ("", "", tag)
+            if tag == "O":
+                current = None
+                continue
+            if current is not None and prefix != "B" and label == current["label"]:
+                current["end"] = token_end
+                current["scores"].append(score)
+            else:
+                current = {"label": label, "start": token_start, "end": token_end, "scores": [score]}
+                spans.append(current)
+        
+        return [
+            {
+                "label": span["label"],
+                "text": text[span["start"]:span["end"]],
+                "start": span["start"],
+                "end": span["end"],
+                "score": round(sum(span["scores"]) / len(span["scores"]), 4)
+            }
+            for span in spans
+        ]
+
+def get_entity_extractor() -> Optional[ReceiptEntityExtractor]:
+    """
+    Return the process-wide entity model, loading it on first use. The model
+    is only enabled when RECEIPT_NER_MODEL names a token classification
+    model (this needs torch installed).
+    """
+    model_name = os.environ.get("RECEIPT_NER_MODEL")
+    if not model_name:
+        return None
+    return get_process_resource("entity_extractor", lambda: ReceiptEntityExtractor(
+        model_name,
+        quantize=os.environ.get("RECEIPT_NER_QUANTIZE", "0") == "1",
+        max_length=int(os.environ.get("RECEIPT_NER_MAX_LENGTH", "256")),
+        batch_size=int(os.environ.get("RECEIPT_NER_BATCH_SIZE", "8"))
+    ))
+
+def get_ingredient_matcher() -> IngredientMatcher:
+    """Return the process-wide matcher, building it on first use"""
+    return get_process_resource("ingredient_matcher", _build_ingredient_matcher)
+
+def _build_ingredient_matcher() -> IngredientMatcher:
+    lexicon = {canonical: list(aliases) for canonical, aliases in INGREDIENT_LEXICON.items()}
+    lexicon_path = os.environ.get("INGREDIENT_LEXICON_PATH")
+    if lexicon_path:
+        for canonical, aliases in load_ingredient_lexicon(lexicon_path).items():
+            lexicon.setdefault(canonical, []).extend(aliases)
+    return IngredientMatcher(lexicon)
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """
+    The process-wide pool for batch receipt analysis. Workers are spawned,
+    not forked: a fork of the threaded server could copy a resource lock
+    another thread holds and hang. They start on demand, so a small batch
+    only starts as many as it has chunks, and each builds the matcher and
+    entity model once, when it starts. RECEIPT_POOL_WORKERS caps their
+    number (default: one per CPU).
+    """
+    return get_process_resource("analysis_pool", lambda: ProcessPoolExecutor(
+        max_workers=int(os.environ.get("RECEIPT_POOL_WORKERS", os.cpu_count() or 1)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_analysis_worker
+    ))
+
+def discard_analysis_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool, e.g. after a worker crashed, so the next batch starts a new one"""
+    with _process.lock:
+        if _process.resources.get("analysis_pool") is pool:
+            del _process.resources["analysis_pool"]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _init_analysis_worker():
+    get_ingredient_matcher()
+    get_entity_extractor()
+
+def start_warm_up():
+    """
+    Load heavy modules and models on a background thread, once per process,
+    so the first page that needs them doesn't wait
+    """
+    with _process.lock:
+        if _process.warm_up_started:
+            return
+        _process.warm_up_started = True
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+def _warm_up():
+    steps = [
+        ("numpy", lambda: np.zeros(1)),
+        ("PIL", lambda: Image.new("RGB", (1, 1))),
+        ("pandas", lambda: pd.DataFrame()),
+        ("ingredient_matcher", get_ingredient_matcher),
+        ("entity_extractor", get_entity_extractor)
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", name)
+            continue
+        _process.timings.setdefault(f"warm-up {name}", time.perf_counter() - started)
+
+# Days an ingredient keeps under each storage condition it can be stored in
+SHELF_LIFE_TABLE = {
+    "beef": {"fridge": 3, "freezer": 120},
+    "chicken": {"fridge": 2, "freezer": 270},
+    "pork": {"fridge": 3, "freezer": 120},
+    "fish": {"fridge": 2, "freezer": 90},
+    "shrimp": {"fridge": 2, "freezer": 90},
+    "lettuce": {"fridge": 7},
+    "tomato": {"pantry": 5, "fridge": 10},
+    "vegetables": {"fridge": 5, "freezer": 240},
+    "cheese": {"fridge": 21, "freezer": 180},
+    "bread": {"pantry": 5, "fridge": 7, "freezer": 90},
+    "dough": {"fridge": 3, "freezer": 90},
+    "milk": {"fridge": 7, "freezer": 90},
+    "cultures": {"fridge": 14},
+    "eggs": {"pantry": 14, "fridge": 28},
+    "rice": {"pantry": 365},
+    "pasta": {"pantry": 365},
+}
+STORAGE_CONDITIONS = ("pantry", "fridge", "freezer")
+DEFAULT_SHELF_LIFE_DAYS = 7  # For ingredients missing from the table
+
+class ShelfLifeTable:
+    """
+    Shelf-life table compiled to arrays so expiry dates for any number of
+    (upload date, ingredient) line items are computed in one vectorized pass.
+    Ingredients that can't be kept in the requested storage fall back to
+    the first condition listed for them.
+    """
+    def __init__(self, table: dict, default_days: int = DEFAULT_SHELF_LIFE_DAYS):
+        self.index = pd.Index(list(table))
+        self.default_days = default_days
+        self.days_by_storage = {}
+        for storage in STORAGE_CONDITIONS:
+            self.days_by_storage[storage] = np.array([
+                conditions.get(storage, next(iter(conditions.values()), default_days))
+                for conditions in table.values()
+            ], dtype=np.int64)
+    
+    def shelf_life_days(self, ingredients, storage: str = "fridge") -> "np.ndarray":
+        positions = self.index.get_indexer(ingredients)
+        days = self.days_by_storage[storage]
+        return np.where(positions >= 0, days[positions], self.default_days)
+    
+    def expiry_dates(self, upload_dates, ingredients, storage: str = "fridge") -> "np.ndarray":
+        """Return datetime64[s] expiry dates for parallel arrays of upload dates and ingredients"""
+        upload_dates = np.asarray(upload_dates, dtype="datetime64[s]")
+        return upload_dates + self.shelf_life_days(ingredients, storage).astype("timedelta64[D]")
+
+def get_shelf_life_table() -> ShelfLifeTable:
+    return get_process_resource("shelf_life_table", lambda: ShelfLifeTable(SHELF_LIFE_TABLE))
+
+def analyze_receipt(receipt_id: str, upload_date: datetime, image_data: Optional[bytes],
+                    ocr_text: str = "", extract_entities: bool = True) -> dict:
+    """
+    Decode a receipt image, extract its text, ingredients and entities, and
+    calculate shelf life. Only takes and returns plain data so it can run
+    in a worker process.
+    """
+    # Decoding the image also produces the previews shown in the receipt history
+    thumbnails = {}
+    if image_data:
+        try:
+            thumbnails = make_thumbnails(image_data)
+        except OSError:
+            raise ValueError(f"Receipt {receipt_id} is not a readable image")
+    
+    if not ocr_text:
+        # Simulate OCR
+        # In a real system, this would run actual OCR on the image
+        sample_ingredients = ["beef", "chicken", "lettuce", "tomato", 
+                              "cheese", "bread", "milk", "eggs", "rice", "pasta"]
+        
+        # Randomly print 2-5 of the sample ingredients under one of their names
+        num_ingredients = random.randint(2, 5)
+        ocr_text = f"Receipt #{receipt_id}\n"
+        ocr_text += f"Date: {upload_date.strftime('%Y-%m-%d')}\n"
+        ocr_text += "Items:\n"
+        for ingredient in random.sample(sample_ingredients, num_ingredients):
+            name = random.choice(INGREDIENT_LEXICON[ingredient])
+            ocr_text += f"- {name.capitalize()} ${random.uniform(1.99, 15.99):.2f}\n"
+    
+    ingredients = get_ingredient_matcher().extract(ocr_text)
+    
+    # Each ingredient expires on its own; the receipt's shelf life is the earliest of them
+    expiry_dates = get_shelf_life_table().expiry_dates([upload_date] * len(ingredients), ingredients).tolist()
+    ingredient_expiry = dict(zip(ingredients, expiry_dates))
+    shelf_life = min(expiry_dates, default=upload_date + timedelta(days=DEFAULT_SHELF_LIFE_DAYS))
+    
+    entities = _extract_entities([ocr_text])[0] if extract_entities else []
+    
+    return {
+        "ocr_text": ocr_text,
+        "ingredients": ingredients,
+        "shelf_life": shelf_life,
+        "ingredient_expiry": ingredient_expiry,
+        "thumbnails": thumbnails,
+        "entities": entities
+    }
+
+def analyze_receipts(requests: List[tuple]) -> list:
+    """
+    Analyze several receipts given as analyze_receipt argument tuples,
+    running the entity model over all of their text in micro-batches.
+    Returns one analysis dict, or the exception raised, per receipt.
+    """
+    analyses = []
+    for args in requests:
+        try:
+            analyses.append(analyze_receipt(*args, extract_entities=False))
+        except Exception as e:
+            analyses.append(e)
+    
+    succeeded = [analysis for analysis in analyses if not isinstance(analysis, Exception)]
+    for analysis, receipt_entities in zip(succeeded, _extract_entities([analysis["ocr_text"] for analysis in succeeded])):
+        analysis["entities"] = receipt_entities
+    return analyses
+
+def _extract_entities(texts: List[str]) -> List[List[dict]]:
+    """
+    Entities for each text, or none when the model is disabled. Entities
+    are optional, so a model that fails to load or run leaves the receipts
+    without them rather than failing their analysis.
+    """
+    try:
+        extractor = get_entity_extractor()
+        if extractor is not None:
+            return extractor.extract_batch(texts)
+    except Exception:
+        logger.exception("Entity extraction failed for %d receipts", len(texts))
+    return [[] for _ in texts]
+
+def _analysis_request(receipt: Receipt) -> tuple:
+    return (receipt.receipt_id, receipt.upload_date, receipt.image_data, receipt.ocr_text)
+
+class ReceiptJob:
+    def __init__(self, job_id: str, receipt: Receipt, customer_id: str, image_data: Optional[bytes]):
+        self.job_id = job_id
+        self.receipt = receipt
+        self.customer_id = customer_id
+        self.image_data = image_data
+        self.status = "queued"  # queued -> processing -> done | failed
+        self.analysis = None
+        self.error = None
+        self.submitted_at = datetime.now()
+
+class ReceiptJobQueue:
+    """
+    Runs analyze_receipt for submitted receipts on background threads so the
+    page doesn't block. Worker threads are started on demand and exit once
+    the queue has been idle for idle_timeout seconds. Finished jobs are
+    handed back by collect() and merged into the ReceiptSystem by the
+    script thread, which owns it.
+    """
+    def __init__(self, num_workers: int = 2, idle_timeout: float = 5.0, batch_size: int = 8):
+        self.num_workers = num_workers
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size  # Queued receipts analyzed together, see analyze_receipts
+        self.jobs = {}  # Map job_id to ReceiptJob, in submission order
+        self._pending = queue.Queue()
+        self._finished = []  # Jobs done or failed but not yet collected
+        self._lock = threading.Lock()
+        self._active_workers = 0
+    
+    def submit(self, receipt: Receipt, customer_id: str) -> str:
+        """Queue a receipt for processing and return its job id immediately"""
+        job = ReceiptJob(uuid.uuid4().hex[:8], receipt, customer_id, receipt.image_data)
+        self.jobs[job.job_id] = job
+        self._pending.put(job)
+        with self._lock:
+            if self._active_workers < self.num_workers:
+                self._active_workers += 1
+                threading.Thread(target=self._work, daemon=True).start()
+        return job.job_id
+    
+    def get(self, job_id: str) -> Optional[ReceiptJob]:
+        return self.jobs.get(job_id)
+    
+    def jobs_for_customer(self, customer_id: str) -> List[ReceiptJob]:
+        return [job for job in self.jobs.values() if job.customer_id == customer_id]
+    
+    def collect(self) -> List[ReceiptJob]:
+        """Return jobs that finished since the last call"""
+        with self._lock:
+            finished, self._finished = self._finished, []
+        return finished
+    
+    def dismiss(self, job_ids):
+        """Forget finished jobs, e.g. failed ones the user has seen"""
+        for job_id in job_ids:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status in ("done", "failed"):
+                del self.jobs[job_id]
+    
+    def _work(self):
+        released = False
+        try:
+            while True:
+                try:
+                    job = self._pending.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        # Re-check under the lock so a job submitted just now isn't stranded
+                        if self._pending.empty():
+                            self._active_workers -= 1
+                            released = True
+                            return
+                    continue
+                
+                # Take whatever else is already waiting, up to one micro-batch
+                batch = [job]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._pending.get_nowait())
+                    except queue.Empty:
+                        break
+                self._process(batch)
+        finally:
+            if not released:
+                # The worker is dying; give its slot back so submit() starts a replacement
+                with self._lock:
+                    self._active_workers -= 1
+    
+    def _process(self, batch: List[ReceiptJob]):
+        for job in batch:
+            job.status = "processing"
+        try:
+            analyses = analyze_receipts([
+                (job.receipt.receipt_id, job.receipt.upload_date, job.image_data, job.receipt.ocr_text)
+                for job in batch
+            ])
+        except Exception as e:
+            logger.exception("Receipt batch failed")
+            analyses = [e] * len(batch)
+        
+        for job, analysis in zip(batch, analyses):
+            if isinstance(analysis, Exception):
+                job.error = analysis
+                job.status = "failed"
+            else:
+                job.analysis = analysis
+                job.status = "done"
+            job.image_data = None
+        with self._lock:
+            self._finished.extend(batch)
+
+ExpiryEntry = namedtuple("ExpiryEntry", ["expiry", "customer_id", "receipt_id", "ingredient"])
+
+class ExpiryIndex:
+    """
+    Ingredient expiry dates from every receipt, kept sorted globally and per
+    customer, so questions like "what expires in the next 3 days" are a
+    binary search plus the size of the answer
+    """
     def __init__(self):
-        self.customers = []
+        self._entries = []  # Sorted ExpiryEntry for all customers
+        self._by_customer = {}  # Map customer_id to sorted ExpiryEntry list
+    
+    def add(self, customer_id: str, receipt: Receipt):
+        for entry in self._receipt_entries(customer_id, receipt):
+            bisect.insort(self._entries, entry)
+            bisect.insort(self._by_customer.setdefault(customer_id, []), entry)
+    
+    def rebuild(self, receipts: dict):
+        """Index all receipts (a map of customer_id to receipts) at once"""
+        self._by_customer = {
+            customer_id: sorted(entry for receipt in customer_receipts
+                                for entry in self._receipt_entries(customer_id, receipt))
+            for customer_id, customer_receipts in receipts.items()
+        }
+        self._entries = sorted(entry for entries in self._by_customer.values() for entry in entries)
+    
+    def range(self, start: datetime, end: datetime, customer_id: Optional[str] = None) -> List[ExpiryEntry]:
+        """Entries expiring at or after start and before end, soonest first"""
+        entries = self._entries_for(customer_id)
+        return entries[bisect.bisect_left(entries, (start,)):bisect.bisect_left(entries, (end,))]
+    
+    def count(self, start: datetime, end: datetime, customer_id: Optional[str] = None) -> int:
+        entries = self._entries_for(customer_id)
+        return bisect.bisect_left(entries, (end,)) - bisect.bisect_left(entries, (start,))
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _entries_for(self, customer_id: Optional[str]) -> List[ExpiryEntry]:
+        return self._entries if customer_id is None else self._by_customer.get(customer_id, [])
+    
+    @staticmethod
+    def _receipt_entries(customer_id: str, receipt: Receipt) -> List[ExpiryEntry]:
+        # Receipts processed before per-ingredient expiry share the receipt's shelf life
+        expiry_dates = receipt.ingredient_expiry or dict.fromkeys(receipt.ingredients, receipt.shelf_life)
+        return [
+            ExpiryEntry(expiry, customer_id, receipt.receipt_id, ingredient)
+            for ingredient, expiry in expiry_dates.items()
+        ]
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometers"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class StoreLocator:
+    """
+    Grid index over store coordinates for nearest-store and radius queries.
+    Stores are bucketed into cells of cell_degrees x cell_degrees, so a
+    query only measures the distance to stores in the cells its search
+    circle overlaps.
+    """
+    def __init__(self, cell_degrees: float = 0.25):
+        self.cell_degrees = cell_degrees
+        self._rows = math.ceil(180 / cell_degrees)
+        self._columns = math.ceil(360 / cell_degrees)
+        self._cells = {}  # Map (row, column) to list of (lat, lon, store)
+        self._size = 0
+    
+    def add(self, store: Store):
+        lat, lon = self._validate(store.location)
+        self._cells.setdefault(self._cell(lat, lon), []).append((lat, lon, store))
+        self._size += 1
+    
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, Store]]:
+        """(distance_km, store) pairs for stores within radius_km, nearest first"""
+        lat, lon = self._validate((lat, lon))
+        found = []
+        for cell in self._cells_within(lat, lon, radius_km):
+            for store_lat, store_lon, store in self._cells.get(cell, ()):
+                distance = haversine_km(lat, lon, store_lat, store_lon)
+                if distance <= radius_km:
+                    found.append((distance, store))
+        found.sort(key=lambda pair: pair[0])
+        return found
+    
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[float, Store]]:
+        """(distance_km, store) pairs for the k nearest stores, nearest first"""
+        if k <= 0 or not self._size:
+            return []
+        # Widen the search circle until it holds k stores; nothing outside it can be nearer
+        radius_km = self.cell_degrees * math.pi * EARTH_RADIUS_KM / 180
+        while True:
+            found = self.within(lat, lon, radius_km)
+            if len(found) >= k or radius_km >= math.pi * EARTH_RADIUS_KM:
+                return found[:k]
+            radius_km *= 2
+    
+    def __len__(self):
+        return self._size
+    
+    @staticmethod
+    def _validate(location) -> Tuple[float, float]:
+        try:
+            lat, lon = (float(value) for value in location)
+        except (TypeError, ValueError):
+            raise ValueError(f"Location {location!r} is not a (lat, lon) pair")
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f"Location {location!r} is out of range")
+        return lat, lon
+    
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = min(int((lat + 90) // self.cell_degrees), self._rows - 1)
+        column = int((lon + 180) // self.cell_degrees) % self._columns
+        return row, column
+    
+    def _cells_within(self, lat: float, lon: float, radius_km: float):
+        """Cells overlapping the bounding box of the search circle"""
+        angle = radius_km / EARTH_RADIUS_KM
+        lat_span = math.degrees(angle)
+        first_row = self._cell(max(-90.0, lat - lat_span), 0)[0]
+        last_row = self._cell(min(90.0, lat + lat_span), 0)[0]
+        
+        # Longitude extent of the circle; every column if it covers a pole
+        if lat + lat_span >= 90 or lat - lat_span <= -90 or math.sin(angle) >= math.cos(math.radians(lat)):
+            columns = None
+        else:
+            lon_span = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            first_column = int((lon - lon_span + 180) // self.cell_degrees)
+            last_column = int((lon + lon_span + 180) // self.cell_degrees)
+            if last_column - first_column + 1 >= self._columns:
+                columns = None
+            else:
+                columns = [column % self._columns for column in range(first_column, last_column + 1)]
+        
+        num_columns = self._columns if columns is None else len(columns)
+        if (last_row - first_row + 1) * num_columns > len(self._cells):
+            # Cheaper to check the occupied cells than to enumerate the box
+            column_set = None if columns is None else set(columns)
+            return [cell for cell in self._cells
+                    if first_row <= cell[0] <= last_row and (column_set is None or cell[1] in column_set)]
+        columns = range(self._columns) if columns is None else columns
+        return [(row, column) for row in range(first_row, last_row + 1) for column in columns]
+
+Reminder = namedtuple("Reminder", ["reminder_id", "due", "payload"])
+
+class MemoryOutbox:
+    """Keeps the most recently delivered reminders in memory"""
+    def __init__(self, maxlen: int = 1000):
+        self.reminders = deque(maxlen=maxlen)
+    
+    def deliver(self, reminders: List[Reminder]):
+        self.reminders.extend(reminders)
+
+class FileOutbox:
+    """
+    Appends delivered reminders to a JSON Lines file. Reminders whose
+    reminder_id is already in the file are skipped, so processes sharing
+    the file, or restarting, deliver each reminder once.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._delivered = set()  # Keys of reminder_ids found in the file
+        self._offset = 0  # Bytes of the file already read into _delivered
+    
+    def deliver(self, reminders: List[Reminder]):
+        with open(self.path, "a+b") as f:
+            # Catch up on lines appended since the last delivery, e.g. by other processes
+            f.seek(self._offset)
+            data = f.read()
+            data = data[:data.rfind(b"\n") + 1]  # A line still being written is read next time
+            self._offset += len(data)
+            for line in data.splitlines():
+                try:
+                    self._delivered.add(_reminder_key(json.loads(line)["reminder_id"]))
+                except (ValueError, KeyError, TypeError):
+                    continue  # Lines from before reminder ids were recorded
+            
+            for reminder in reminders:
+                key = _reminder_key(reminder.reminder_id)
+                if key in self._delivered:
+                    continue
+                self._delivered.add(key)
+                line = {"reminder_id": reminder.reminder_id, "due": reminder.due.isoformat(), **reminder.payload}
+                f.write((json.dumps(line, default=str) + "\n").encode("utf-8"))
+
+def _reminder_key(reminder_id) -> str:
+    # Tuple ids come back from JSON as lists, so compare their JSON form
+    return json.dumps(reminder_id, default=str)
+
+class ReminderScheduler:
+    """
+    Hierarchical timing wheel for expiry reminders. With the default one
+    minute tick, level 0 has a slot per minute for the next hour, level 1 a
+    slot per hour for the next day and level 2 a slot per day for the next
+    512 days; anything later waits in an overflow bucket. schedule() and
+    cancel() are O(1). advance() moves the clock, cascading coarse slots
+    into finer ones as their time comes, and delivers everything that came
+    due to the sinks in one batch. Stretches with no pending reminders in
+    the finer levels are skipped rather than ticked through.
+    
+    A delivered reminder_id is ignored by schedule() until forget_after has
+    passed since it was due, so rescheduling never delivers it twice. All
+    methods are thread-safe.
+    """
+    def __init__(self, start: datetime, sinks: list, tick: timedelta = timedelta(minutes=1),
+                 wheel_sizes: Tuple[int, ...] = (60, 24, 512), forget_after: timedelta = timedelta(days=30)):
+        self.sinks = sinks
+        self.forget_after = forget_after
+        self._lock = threading.RLock()
+        self._origin = start
+        self._tick_seconds = tick.total_seconds()
+        self._now = 0  # Current time in ticks since start
+        self._wheel_sizes = wheel_sizes
+        self._spans = []  # Ticks covered by one slot at each level
+        span = 1
+        for size in wheel_sizes:
+            self._spans.append(span)
+            span *= size
+        self._horizon = span  # Ticks covered by all levels together
+        self._wheels = [[{} for _ in range(size)] for size in wheel_sizes]
+        self._counts = [0] * len(wheel_sizes)  # Reminders per level, to skip empty stretches
+        self._overflow = {}
+        self._ready = {}  # Already due; delivered at the next advance
+        self._locations = {}  # Map reminder_id to (level, bucket); level is None outside the wheels
+        self._delivered = {}  # Map reminder_id to due for reminders already delivered
+        self._delivered_order = []  # Heap of (due, sequence, reminder_id) for forgetting them
+        self._sequence = 0
+    
+    def schedule(self, reminder_id, due: datetime, payload: dict) -> bool:
+        """
+        Register a reminder, replacing any pending one with the same id.
+        Returns False if it was already delivered and is ignored.
+        """
+        with self._lock:
+            if reminder_id in self._delivered:
+                return False
+            self.cancel(reminder_id)
+            self._place(Reminder(reminder_id, due, payload))
+            return True
+    
+    def cancel(self, reminder_id) -> bool:
+        with self._lock:
+            location = self._locations.pop(reminder_id, None)
+            if location is None:
+                return False
+            level, bucket = location
+            del bucket[reminder_id]
+            if level is not None:
+                self._counts[level] -= 1
+            return True
+    
+    def advance(self, now: datetime) -> List[Reminder]:
+        """Move the clock to now and deliver every reminder that came due"""
+        with self._lock:
+            target = int((now - self._origin).total_seconds() // self._tick_seconds)
+            fired = self._take(self._ready)
+            while self._now < target:
+                self._now = self._next_event(target)
+                self._on_tick(fired)
+            
+            for reminder in fired:
+                self._delivered[reminder.reminder_id] = reminder.due
+                heapq.heappush(self._delivered_order, (reminder.due, self._sequence, reminder.reminder_id))
+                self._sequence += 1
+            self._forget_delivered(now - self.forget_after)
+            
+            if fired:
+                for sink in self.sinks:
+                    sink.deliver(fired)
+            return fired
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._locations)
+    
+    def _forget_delivered(self, cutoff: datetime):
+        order = self._delivered_order
+        while order and order[0][0] < cutoff:
+            due, _, reminder_id = heapq.heappop(order)
+            if self._delivered.get(reminder_id) == due:
+                del self._delivered[reminder_id]
+    
+    def _due_tick(self, due: datetime) -> int:
+        # Round up so reminders never fire early
+        return math.ceil((due - self._origin).total_seconds() / self._tick_seconds)
+    
+    def _place(self, reminder: Reminder):
+        due_tick = self._due_tick(reminder.due)
+        level, bucket = None, self._overflow
+        if due_tick <= self._now:
+            bucket = self._ready
+        else:
+            for candidate, (size, span) in enumerate(zip(self._wheel_sizes, self._spans)):
+                if due_tick // span - self._now // span < size:
+                    level, bucket = candidate, self._wheels[candidate][(due_tick // span) % size]
+                    self._counts[candidate] += 1
+                    break
+        bucket[reminder.reminder_id] = reminder
+        self._locations[reminder.reminder_id] = (level, bucket)
+    
+    def _take(self, bucket: dict) -> List[Reminder]:
+        reminders = list(bucket.values())
+        for reminder in reminders:
+            del self._locations[reminder.reminder_id]
+        bucket.clear()
+        return reminders
+    
+    def _next_event(self, target: int) -> int:
+        """The next tick at which a slot fires or cascades, capped at target"""
+        for level, span in enumerate(self._spans):
+            if self._counts[level]:
+                return min(target, (self._now // span + 1) * span)
+        if self._overflow:
+            return min(target, (self._now // self._horizon + 1) * self._horizon)
+        return target
+    
+    def _on_tick(self, fired: List[Reminder]):
+        tick = self._now
+        if tick % self._horizon == 0 and self._overflow:
+            for reminder in self._take(self._overflow):
+                self._place(reminder)
+        
+        # Cascade from the coarsest level down so reminders can drop several levels at once
+        for level in reversed(range(1, len(self._wheel_sizes))):
+            span = self._spans[level]
+            if tick % span == 0:
+                bucket = self._wheels[level][(tick // span) % self._wheel_sizes[level]]
+                self._counts[level] -= len(bucket)
+                for reminder in self._take(bucket):
+                    self._place(reminder)
+        
+        bucket = self._wheels[0][tick % self._wheel_sizes[0]]
+        self._counts[0] -= len(bucket)
+        fired.extend(self._take(bucket))
+        fired.extend(self._take(self._ready))
+
+REMINDER_LEAD_TIME = timedelta(days=1)  # How long before expiry to remind
+
+class ReminderFeed:
+    """
+    Keeps a scheduler filled from the database's receipt_items expiry index.
+    Only line items whose reminder falls within horizon of now are loaded,
+    a slice of step at a time, and each top_up extends the loaded range as
+    time advances, so no receipt rows are decoded and memory holds only
+    the upcoming reminders.
+    """
+    def __init__(self, database: "ReceiptDatabase", scheduler: ReminderScheduler,
+                 lead_time: timedelta = REMINDER_LEAD_TIME, horizon: timedelta = timedelta(days=1),
+                 step: timedelta = timedelta(hours=1)):
+        self.database = database
+        self.scheduler = scheduler
+        self.lead_time = lead_time
+        self.horizon = horizon
+        self.step = step
+        self._loaded_until = None  # Expiry up to which line items were scheduled
+    
+    def top_up(self, now: datetime):
+        # Items that already expired get no reminder, as in ReceiptSystem._schedule_reminders
+        start = self._loaded_until or now
+        end = now + self.lead_time + self.horizon
+        while start < end:
+            stop = min(end, start + self.step)
+            for customer_id, receipt_id, ingredient, purchased, expiry in self.database.reminder_items(start, stop):
+                self.scheduler.schedule((customer_id, receipt_id, ingredient), expiry - self.lead_time, {
+                    "customer_id": customer_id,
+                    "receipt_id": receipt_id,
+                    "ingredient": ingredient,
+                    "purchased": purchased,
+                    "expiry": expiry
+                })
+            start = self._loaded_until = stop
+
+class ReminderTicker:
+    """
+    Background thread that tops up every registered feed and advances every
+    registered scheduler each interval seconds, starting as soon as it is
+    created, so reminders fire whether or not a page is rerun. Schedulers
+    are held weakly and drop out once their owner is gone.
+    """
+    def __init__(self, interval: float = 30.0):
+        self.interval = interval
+        self._schedulers = weakref.WeakSet()
+        self._feeds = []
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def add(self, scheduler: ReminderScheduler):
+        with self._lock:
+            self._schedulers.add(scheduler)
+            self._start()
+    
+    def add_feed(self, feed: ReminderFeed):
+        with self._lock:
+            self._feeds.append(feed)
+            self._start()
+    
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="reminder-ticker", daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                feeds = list(self._feeds)
+                schedulers = list(self._schedulers)
+            now = datetime.now()
+            for feed in feeds:
+                try:
+                    feed.top_up(now)
+                except Exception:
+                    logger.exception("Loading reminders failed")
+            for scheduler in schedulers:
+                try:
+                    scheduler.advance(now)
+                except Exception:
+                    logger.exception("Delivering reminders failed")
+            time.sleep(self.interval)
+
+def get_reminder_ticker() -> ReminderTicker:
+    return get_process_resource("reminder_ticker", lambda: ReminderTicker(
+        float(os.environ.get("RECEIPT_REMINDER_INTERVAL", "30"))
+    ))
+
+def get_reminder_scheduler() -> ReminderScheduler:
+    """
+    The process-wide scheduler for reminders on the shared database, kept
+    ticking by the reminder ticker. Sessions schedule the receipts they add;
+    saved ones are loaded by a ReminderFeed on the ticker thread, so no page
+    waits for them. Besides an in-memory outbox it delivers to the JSON
+    Lines file named by RECEIPT_REMINDER_OUTBOX, if set.
+    """
+    def create():
+        sinks = [MemoryOutbox()]
+        if os.environ.get("RECEIPT_REMINDER_OUTBOX"):
+            sinks.append(FileOutbox(os.environ["RECEIPT_REMINDER_OUTBOX"]))
+        scheduler = ReminderScheduler(datetime.now(), sinks)
+        ticker = get_reminder_ticker()
+        database = get_database()
+        if database is not None:
+            ticker.add_feed(ReminderFeed(database, scheduler))
+        ticker.add(scheduler)
+        return scheduler
+    return get_process_resource("reminder_scheduler", create)
+
+class RecommendationCache:
+    """LRU cache of recommendation results keyed by customer_id"""
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # Map customer_id to (fingerprint, items)
+    
+    def get(self, customer_id: str, fingerprint: tuple) -> Optional[List[MenuItem]]:
+        entry = self._entries.get(customer_id)
+        if entry is None or entry[0] != fingerprint:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(customer_id)
+        self.hits += 1
+        return list(entry[1])
+    
+    def put(self, customer_id: str, fingerprint: tuple, items: List[MenuItem]):
+        self._entries[customer_id] = (fingerprint, list(items))
+        self._entries.move_to_end(customer_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, customer_id: str):
+        self._entries.pop(customer_id, None)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# customer_id is set for receipts, line_number for records read by read_jsonl
+DumpRecord = namedtuple("DumpRecord", ["kind", "entity", "customer_id", "line_number"], defaults=[None])
+
+def parse_record(record: dict) -> DumpRecord:
+    """Validate one JSON Lines record and build its entity"""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    kind = record.get("type")
+    if kind == "store":
+        return DumpRecord(kind, Store.from_dict(record["data"]), None)
+    elif kind == "customer":
+        return DumpRecord(kind, Customer.from_dict(record["data"]), None)
+    elif kind == "receipt":
+        if not isinstance(record.get("customer_id"), str):
+            raise ValueError("receipt record has no customer_id")
+        return DumpRecord(kind, Receipt.from_dict(record["data"]), record["customer_id"])
+    raise ValueError(f"unknown record type {kind!r}")
+
+def read_jsonl(path: str, progress=None, progress_every: int = 1000):
+    """
+    Stream DumpRecords from a JSON Lines file, one line at a time. Each
+    record is validated as it is read, and a bad line raises ValueError
+    naming its line number. progress is called with the number of lines
+    read so far every progress_every lines and once at the end.
+    """
+    line_number = 0
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = parse_record(json.loads(line))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"Line {line_number}: invalid record ({e!r})") from e
+            yield record._replace(line_number=line_number)
+            if progress and line_number % progress_every == 0:
+                progress(line_number)
+    if progress:
+        progress(line_number)
+
+def write_jsonl(path: str, records, progress=None, progress_every: int = 1000) -> int:
+    """
+    Write a stream of DumpRecords as JSON Lines, one record at a time.
+    The file is replaced only once the whole stream was written. Returns
+    the number of records written.
+    """
+    count = 0
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as f:
+        try:
+            for record in records:
+                line = {"type": record.kind, "data": record.entity.to_dict()}
+                if record.customer_id is not None:
+                    line["customer_id"] = record.customer_id
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                count += 1
+                if progress and count % progress_every == 0:
+                    progress(count)
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, path)
+    if progress:
+        progress(count)
+    return count
+
+class ReceiptDatabase:
+    """
+    SQLite storage for customers, stores and receipts that several app
+    processes can share. Each row keeps the entity's to_dict form as JSON
+    next to the columns pages filter and sort on, and receipt line items
+    get their own table so expiry queries hit an index. The database runs
+    in WAL mode so readers never wait for a writer. Sessions query it for
+    every page and lookup instead of keeping their own copy of the rows.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS customers (
+        customer_id TEXT PRIMARY KEY,
+        email TEXT NOT NULL UNIQUE,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS stores (
+        store_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS receipts (
+        customer_id TEXT NOT NULL,
+        receipt_id TEXT NOT NULL,
+        upload_date TEXT NOT NULL,
+        shelf_life TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (customer_id, receipt_id)
+    );
+    CREATE INDEX IF NOT EXISTS receipts_by_customer_date ON receipts (customer_id, upload_date);
+    CREATE INDEX IF NOT EXISTS receipts_by_date ON receipts (upload_date);
+    CREATE TABLE IF NOT EXISTS receipt_items (
+        customer_id TEXT NOT NULL,
+        receipt_id TEXT NOT NULL,
+        ingredient TEXT NOT NULL,
+        expiry TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS receipt_items_by_receipt ON receipt_items (customer_id, receipt_id);
+    CREATE INDEX IF NOT EXISTS receipt_items_by_expiry ON receipt_items (expiry);
+    CREATE INDEX IF NOT EXISTS receipt_items_by_customer_expiry ON receipt_items (customer_id, expiry);
+    CREATE TABLE IF NOT EXISTS counters (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        # One connection shared by the session threads, serialized by a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(self.SCHEMA)
+    
+    def write_changes(self, changes: dict):
+        """
+        Write the output of ReceiptSystem.pop_changes in a single transaction.
+        New entities are inserted, never replaced: any whose ID (or customer
+        email) is already taken, e.g. by another session, are left out and
+        reported by a ValueError raised after the rest was committed.
+        """
+        conflicts = []
+        try:
+            with self._lock, self._connection:
+                for customer in changes["customers"]:
+                    if not self._insert_customer(customer):
+                        conflicts.append(f"customer {customer['customer_id']} ({customer['email']})")
+                for store in changes["stores"]:
+                    if not self._insert_store(store):
+                        conflicts.append(f"store {store['store_id']}")
+                for customer_id, receipts in changes["receipts"].items():
+                    for receipt in receipts:
+                        if not self._insert_receipt(customer_id, receipt):
+                            conflicts.append(f"receipt {receipt['receipt_id']} of customer {customer_id}")
+                for customer_id, receipts in changes["updated_receipts"].items():
+                    for receipt in receipts:
+                        if self._connection.execute(
+                                "UPDATE receipts SET upload_date = ?, shelf_life = ?, data = ? "
+                                "WHERE customer_id = ? AND receipt_id = ?",
+                                (receipt["upload_date"], receipt["shelf_life"], json.dumps(receipt),
+                                 customer_id, receipt["receipt_id"])).rowcount:
+                            self._connection.execute(
+                                "DELETE FROM receipt_items WHERE customer_id = ? AND receipt_id = ?",
+                                (customer_id, receipt["receipt_id"])
+                            )
+                            self._insert_items(customer_id, receipt)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Could not save changes: {e}") from e
+        if conflicts:
+            raise ValueError(f"Could not save {', '.join(conflicts)}: already exists")
+    
+    def _insert_customer(self, customer: dict) -> bool:
+        return self._connection.execute(
+            "INSERT INTO customers (customer_id, email, data) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+            (customer["customer_id"], customer["email"], json.dumps(customer))
+        ).rowcount > 0
+    
+    def _insert_store(self, store: dict) -> bool:
+        return self._connection.execute(
+            "INSERT INTO stores (store_id, name, data) VALUES (?, ?, ?) ON CONFLICT DO NOTHING",
+            (store["store_id"], store["name"], json.dumps(store))
+        ).rowcount > 0
+    
+    def _insert_receipt(self, customer_id: str, receipt: dict) -> bool:
+        if not self._connection.execute(
+                "INSERT INTO receipts VALUES (?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                (customer_id, receipt["receipt_id"], receipt["upload_date"],
+                 receipt["shelf_life"], json.dumps(receipt))).rowcount:
+            return False
+        self._insert_items(customer_id, receipt)
+        return True
+    
+    def _insert_items(self, customer_id: str, receipt: dict):
+        expiry_dates = receipt["ingredient_expiry"] or dict.fromkeys(receipt["ingredients"], receipt["shelf_life"])
+        self._connection.executemany(
+            "INSERT INTO receipt_items VALUES (?, ?, ?, ?)",
+            [(customer_id, receipt["receipt_id"], ingredient, expiry) for ingredient, expiry in expiry_dates.items()]
+        )
+    
+    def write_records(self, records, batch_size: int = 1000) -> int:
+        """
+        Write a stream of DumpRecords, e.g. from read_jsonl, in transactions
+        of batch_size records so memory stays flat however long the stream is.
+        The import is not all-or-nothing: a record whose ID (or customer
+        email) is already taken, or a receipt for a customer who does not
+        exist, is skipped and the rest of the stream is still written. The
+        skipped records are then reported, each by its line like
+        from_records does, in a ValueError. Returns the number of records
+        written.
+        """
+        count = 0
+        skipped = []
+        batch = []
+        for number, record in enumerate(records, start=1):
+            batch.append((record.line_number or number, record))
+            if len(batch) == batch_size:
+                count += self._write_record_batch(batch, skipped)
+                batch = []
+        count += self._write_record_batch(batch, skipped)
+        if skipped:
+            shown = "; ".join(skipped[:10])
+            more = f" (and {len(skipped) - 10} more)" if len(skipped) > 10 else ""
+            raise ValueError(f"Skipped {len(skipped)} records after writing {count}: {shown}{more}")
+        return count
+    
+    def _write_record_batch(self, batch: list, skipped: list) -> int:
+        count = 0
+        with self._lock, self._connection:
+            for line_number, record in batch:
+                entity = record.entity.to_dict()
+                try:
+                    if record.kind == "store":
+                        if not self._insert_store(entity):
+                            raise ValueError(f"store {entity['store_id']} already exists")
+                    elif record.kind == "customer":
+                        if not self._insert_customer(entity):
+                            raise ValueError(f"customer {entity['customer_id']} ({entity['email']}) already exists")
+                    elif not self._connection.execute(
+                            "SELECT 1 FROM customers WHERE customer_id = ?", (record.customer_id,)).fetchone():
+                        raise ValueError(f"receipt {entity['receipt_id']} is for unknown customer {record.customer_id}")
+                    elif not self._insert_receipt(record.customer_id, entity):
+                        raise ValueError(f"receipt {entity['receipt_id']} of customer {record.customer_id} already exists")
+                    count += 1
+                except (sqlite3.IntegrityError, ValueError) as e:
+                    skipped.append(f"Line {line_number}: {e}")
+        return count
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return not self._connection.execute(
+                "SELECT EXISTS (SELECT 1 FROM customers) OR EXISTS (SELECT 1 FROM stores)"
+            ).fetchone()[0]
+    
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM customers WHERE customer_id = ?", (customer_id,)).fetchone()
+        return Customer.from_dict(json.loads(row[0])) if row else None
+    
+    def get_customer_by_email(self, email: str) -> Optional[Customer]:
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM customers WHERE email = ?", (email,)).fetchone()
+        return Customer.from_dict(json.loads(row[0])) if row else None
+    
+    def count_customers(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+    
+    def customer_emails(self, located: bool = False) -> List[str]:
+        """Emails of all customers in registration order, or only of those who shared their location"""
+        query = "SELECT email FROM customers"
+        if located:
+            query += " WHERE json_extract(data, '$.location') IS NOT NULL"
+        with self._lock:
+            return [row[0] for row in self._connection.execute(query + " ORDER BY rowid")]
+    
+    def iter_customers(self, batch_size: int = 1000):
+        """Stream every customer in registration order, batch_size rows per query"""
+        for _, data in self._iter_rows("SELECT rowid, data FROM customers", batch_size):
+            yield Customer.from_dict(json.loads(data))
+    
+    def iter_receipts(self, batch_size: int = 1000):
+        """Stream every receipt as (customer_id, receipt) in insertion order, batch_size rows per query"""
+        for _, customer_id, data in self._iter_rows("SELECT rowid, customer_id, data FROM receipts", batch_size):
+            yield customer_id, Receipt.from_dict(json.loads(data))
+    
+    def stores_after(self, rowid: int) -> List[Tuple[int, Store]]:
+        """(rowid, store) for the stores added after rowid, in insertion order"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT rowid, data FROM stores WHERE rowid > ? ORDER BY rowid", (rowid,)
+            ).fetchall()
+        return [(row[0], Store.from_dict(json.loads(row[1]))) for row in rows]
+    
+    def _iter_rows(self, query: str, batch_size: int):
+        # Page by rowid so no cursor stays open, and writes between pages are safe
+        rowid = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    f"{query} WHERE rowid > ? ORDER BY rowid LIMIT ?", (rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            rowid = rows[-1][0]
+    
+    def next_receipt_number(self) -> int:
+        """Draw the next number from a counter shared by every process, starting after the existing receipts"""
+        with self._lock, self._connection:
+            return self._connection.execute(
+                "INSERT INTO counters (name, value) VALUES ('receipt', (SELECT COUNT(*) FROM receipts) + 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1 RETURNING value"
+            ).fetchone()[0]
+    
+    def has_receipt(self, customer_id: str, receipt_id: str) -> bool:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM receipts WHERE customer_id = ? AND receipt_id = ?", (customer_id, receipt_id)
+            ).fetchone() is not None
+    
+    def count_receipts(self, customer_id: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM receipts"
+        params = []
+        if customer_id is not None:
+            query += " WHERE customer_id = ?"
+            params.append(customer_id)
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()[0]
+    
+    def purchased_ingredients(self, customer_id: str) -> set:
+        """Every ingredient on the customer's receipts"""
+        with self._lock:
+            return {row[0] for row in self._connection.execute(
+                "SELECT DISTINCT ingredient FROM receipt_items WHERE customer_id = ?", (customer_id,)
+            )}
+    
+    def list_receipts(self, customer_id: str, offset: int = 0, limit: int = 10) -> List[Receipt]:
+        """One page of a customer's receipts in upload order"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM receipts WHERE customer_id = ? ORDER BY upload_date, rowid LIMIT ? OFFSET ?",
+                (customer_id, limit, offset)
+            ).fetchall()
+        return [Receipt.from_dict(json.loads(row[0])) for row in rows]
+    
+    def expiring(self, start: datetime, end: datetime, customer_id: Optional[str] = None,
+                 limit: int = -1) -> List[ExpiryEntry]:
+        """Line items expiring in [start, end), soonest first"""
+        query = "SELECT expiry, customer_id, receipt_id, ingredient FROM receipt_items WHERE expiry >= ? AND expiry < ?"
+        params = [start.isoformat(), end.isoformat()]
+        if customer_id is not None:
+            query += " AND customer_id = ?"
+            params.append(customer_id)
+        query += " ORDER BY expiry LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [ExpiryEntry(datetime.fromisoformat(row[0]), *row[1:]) for row in rows]
+    
+    def reminder_items(self, start: datetime, end: datetime) -> List[tuple]:
+        """
+        (customer_id, receipt_id, ingredient, upload_date, expiry) for the line
+        items expiring in [start, end), read from the expiry index without
+        decoding any receipt
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT i.customer_id, i.receipt_id, i.ingredient, r.upload_date, i.expiry "
+                "FROM receipt_items AS i JOIN receipts AS r USING (customer_id, receipt_id) "
+                "WHERE i.expiry >= ? AND i.expiry < ? ORDER BY i.expiry",
+                (start.isoformat(), end.isoformat())
+            ).fetchall()
+        return [(customer_id, receipt_id, ingredient, datetime.fromisoformat(upload_date), datetime.fromisoformat(expiry))
+                for customer_id, receipt_id, ingredient, upload_date, expiry in rows]
+    
+    def count_expiring(self, start: datetime, end: datetime, customer_id: Optional[str] = None) -> int:
+        query = "SELECT COUNT(*) FROM receipt_items WHERE expiry >= ? AND expiry < ?"
+        params = [start.isoformat(), end.isoformat()]
+        if customer_id is not None:
+            query += " AND customer_id = ?"
+            params.append(customer_id)
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+def get_database() -> Optional[ReceiptDatabase]:
+    """The shared database named by RECEIPT_DB_PATH, or None to keep data in the session only"""
+    path = os.environ.get("RECEIPT_DB_PATH")
+    return get_process_resource("database", lambda: ReceiptDatabase(path) if path else None)
+
+class ReceiptSystem:
+    """
+    Customers, the store catalog and receipts. Without a database everything
+    lives in this object. With one, only the catalog is kept in memory, as
+    the index recommendations run on; customers and receipts are looked up
+    in the database, so every session sees what the others saved.
+    """
+    def __init__(self, database: Optional[ReceiptDatabase] = None, reminders: Optional[ReminderScheduler] = None):
+        self.customers = []  # Without a database only
         self.stores = []
-        self.receipts = {}  # Map customer_id to list of receipts
+        self.receipts = {}  # Map customer_id to list of receipts, without a database only
+        self.customers_by_id = {}
+        self.customers_by_email = {}
+        self.stores_by_id = {}
+        self.store_by_item_id = {}  # Map menu item_id to the first store offering it
+        self.menu_items = []  # All menu items in catalog order
+        self.ingredient_index = {}  # Map ingredient to positions in self.menu_items
+        self.store_positions = {}  # Map store_id to the range of its items in self.menu_items
+        self.store_locator = StoreLocator()
+        self.store_names = []  # Sorted (casefolded name, insertion order, store_id) for prefix search
+        self.catalog_version = 0  # Incremented whenever the catalog changes
+        self.recommendation_cache = RecommendationCache()
+        self.expiry_index = ExpiryIndex()
+        # Systems on shared data pass the process-wide scheduler; others keep their own
+        self.reminders = reminders if reminders is not None else ReminderScheduler(datetime.now(), [MemoryOutbox()])
+        self.reminder_lead_time = REMINDER_LEAD_TIME
+        self.database = database  # Written through by save_system_state when set
+        self._store_rowid = 0  # Last database row of the catalog loaded by refresh_catalog
+        self._receipt_number = 0  # Last number handed out by next_receipt_id without a database
+        
+        # Entities added or modified since the last call to pop_changes
+        self._changed_customers = {}
+        self._changed_stores = {}
+        self._changed_receipts = {}  # Map (customer_id, receipt_id) to (customer_id, receipt)
+        self._updated_receipts = {}  # Receipts changed after they were added, keyed the same way
         
     def register_customer(self, customer: Customer):
         """Register a new customer in the system"""
         # Check if customer already exists
-        if any(c.customer_id == customer.customer_id for c in self.customers):
+        if self.get_customer(customer.customer_id) is not None:
             raise ValueError(f"Customer with ID {customer.customer_id} already exists")
         
-        if any(c.email == customer.email for c in self.customers):
+        if self.get_customer_by_email(customer.email) is not None:
             raise ValueError(f"Customer with email {customer.email} already exists")
             
-        self.customers.append(customer)
-        self.receipts[customer.customer_id] = []
+        self._changed_customers[customer.customer_id] = customer
+        self.recommendation_cache.invalidate(customer.customer_id)
+        if self.database is None:
+            self.customers.append(customer)
+            self.customers_by_id[customer.customer_id] = customer
+            self.customers_by_email[customer.email] = customer
+            self.receipts[customer.customer_id] = []
         
     def add_store(self, store: Store):
         """Add a new store to the system"""
-        if any(s.store_id == store.store_id for s in self.stores):
+        if store.store_id in self.stores_by_id:
             raise ValueError(f"Store with ID {store.store_id} already exists")
+        
+        self.store_locator.add(store)
+        self.stores.append(store)
+        self.stores_by_id[store.store_id] = store
+        self._changed_stores[store.store_id] = store
+        for item in store.menu_items:
+            self.store_by_item_id.setdefault(item.item_id, store)
+        first_position = len(self.menu_items)
+        self._index_menu_items(store.menu_items)
+        self.store_positions[store.store_id] = range(first_position, len(self.menu_items))
+        bisect.insort(self.store_names, (store.name.casefold(), len(self.stores), store.store_id))
+        self.catalog_version += 1
+        self.recommendation_cache.clear()
+    
+    def get_customer(self, customer_id: str) -> Optional[Customer]:
+        if self.database is not None:
+            # Customers registered here but not saved yet come first
+            customer = self._changed_customers.get(customer_id)
+            return customer if customer is not None else self.database.get_customer(customer_id)
+        return self.customers_by_id.get(customer_id)
+    
+    def get_customer_by_email(self, email: str) -> Optional[Customer]:
+        if self.database is not None:
+            for customer in self._changed_customers.values():
+                if customer.email == email:
+                    return customer
+            return self.database.get_customer_by_email(email)
+        return self.customers_by_email.get(email)
+    
+    def count_customers(self) -> int:
+        if self.database is not None:
+            return self.database.count_customers()
+        return len(self.customers)
+    
+    def customer_emails(self, located: bool = False) -> List[str]:
+        """Emails of all customers in registration order, or only of those who shared their location"""
+        if self.database is not None:
+            return self.database.customer_emails(located)
+        return [customer.email for customer in self.customers if customer.location or not located]
+    
+    def iter_customers(self):
+        """Every customer in registration order, streamed from the database if there is one"""
+        if self.database is not None:
+            return self.database.iter_customers()
+        return iter(self.customers)
+    
+    def refresh_catalog(self):
+        """Load the stores saved to the database since the last refresh, e.g. by other sessions"""
+        if self.database is None:
+            return
+        for rowid, store in self.database.stores_after(self._store_rowid):
+            self._store_rowid = rowid
+            if store.store_id not in self.stores_by_id:
+                self.add_store(store)
+                del self._changed_stores[store.store_id]
+    
+    def get_store(self, store_id: str) -> Optional[Store]:
+        return self.stores_by_id.get(store_id)
+    
+    def get_store_for_item(self, item_id: str) -> Optional[Store]:
+        return self.store_by_item_id.get(item_id)
+    
+    def count_stores(self, query: str = "") -> int:
+        """Number of stores whose name starts with query"""
+        first, last = self._store_name_range(query)
+        return last - first
+    
+    def _store_name_range(self, query: str) -> Tuple[int, int]:
+        """Slice of the sorted name index holding names that start with query"""
+        query = query.strip().casefold()
+        if not query:
+            return 0, len(self.store_names)
+        return (bisect.bisect_left(self.store_names, (query,)),
+                bisect.bisect_left(self.store_names, (query + "\U0010ffff",)))
+    
+    def list_stores(self, offset: int = 0, limit: int = 20, query: str = "",
+                    near: Optional[Tuple] = None) -> List[Tuple[Optional[float], Store]]:
+        """
+        One page of stores as (distance_km, store) pairs. query keeps stores
+        whose name starts with it, found by bisecting the sorted name index.
+        near sorts by distance from a (lat, lon) point; otherwise stores come
+        in insertion order, or by name when searching.
+        """
+        if query.strip():
+            first, last = self._store_name_range(query)
+            if near is None:
+                page = self.store_names[first + offset:min(last, first + offset + limit)]
+                return [(None, self.stores_by_id[store_id]) for _, _, store_id in page]
+            
+            matches = sorted(
+                ((haversine_km(*near, *self.stores_by_id[store_id].location), self.stores_by_id[store_id])
+                 for _, _, store_id in self.store_names[first:last]),
+                key=lambda pair: pair[0]
+            )
+            return matches[offset:offset + limit]
+        
+        if near is not None:
+            return self.store_locator.nearest(*near, offset + limit)[offset:]
+        return [(None, store) for store in self.stores[offset:offset + limit]]
+    
+    def count_receipts(self, customer_id: Optional[str] = None) -> int:
+        """Number of the customer's receipts, or of all receipts"""
+        if self.database is not None:
+            return self.database.count_receipts(customer_id)
+        if customer_id is None:
+            return sum(len(receipts) for receipts in self.receipts.values())
+        return len(self.receipts.get(customer_id, ()))
+    
+    def has_receipt(self, customer_id: str, receipt_id: str) -> bool:
+        if (customer_id, receipt_id) in self._changed_receipts:
+            return True
+        if self.database is not None:
+            return self.database.has_receipt(customer_id, receipt_id)
+        return any(receipt.receipt_id == receipt_id for receipt in self.receipts.get(customer_id, ()))
+    
+    def next_receipt_id(self, customer_id: str) -> str:
+        """
+        A new ID for one of the customer's receipts. With a database the
+        numbers come from a counter shared by all sessions, so two sessions
+        never pick the same one.
+        """
+        while True:
+            if self.database is not None:
+                number = self.database.next_receipt_number()
+            else:
+                self._receipt_number = max(self._receipt_number, self.count_receipts()) + 1
+                number = self._receipt_number
+            receipt_id = f"R{number}"
+            if not self.has_receipt(customer_id, receipt_id):
+                return receipt_id
+    
+    def purchased_ingredients(self, customer_id: str) -> set:
+        """Every ingredient on the customer's receipts"""
+        if self.database is not None:
+            return self.database.purchased_ingredients(customer_id)
+        return {ingredient for receipt in self.receipts.get(customer_id, ()) for ingredient in receipt.ingredients}
+    
+    def _iter_receipts(self):
+        """Every receipt as (customer_id, receipt), streamed from the database if there is one"""
+        if self.database is not None:
+            return self.database.iter_receipts()
+        return ((customer_id, receipt) for customer_id, receipts in self.receipts.items() for receipt in receipts)
+    
+    def list_receipts(self, customer_id: str, offset: int = 0, limit: int = 10) -> List[Receipt]:
+        """One page of a customer's receipts in upload order"""
+        if self.database is not None:
+            return self.database.list_receipts(customer_id, offset, limit)
+        return self.receipts.get(customer_id, [])[offset:offset + limit]
+    
+    def expiring(self, start: datetime, end: datetime, customer_id: Optional[str] = None,
+                 limit: int = -1) -> List[ExpiryEntry]:
+        """Line items expiring in [start, end), soonest first"""
+        if self.database is not None:
+            return self.database.expiring(start, end, customer_id, limit)
+        entries = self.expiry_index.range(start, end, customer_id)
+        return entries if limit < 0 else entries[:limit]
+    
+    def count_expiring(self, start: datetime, end: datetime, customer_id: Optional[str] = None) -> int:
+        if self.database is not None:
+            return self.database.count_expiring(start, end, customer_id)
+        return self.expiry_index.count(start, end, customer_id)
+    
+    def _index_menu_items(self, menu_items: List[MenuItem]):
+        """Add menu items to the catalog and the ingredient posting lists"""
+        for item in menu_items:
+            position = len(self.menu_items)
+            self.menu_items.append(item)
+            for ingredient in set(item.ingredients):
+                self.ingredient_index.setdefault(ingredient, []).append(position)
+    
+    def process_receipt(self, receipt: Receipt, customer_id=None):
+        """
+        Process a receipt by extracting text, identifying ingredients,
+        and calculating shelf life
+        """
+        analysis = analyze_receipt(*_analysis_request(receipt))
+        self.apply_analysis(receipt, analysis, customer_id)
+    
+    def process_receipts(self, receipts: List[Receipt], customer_id=None, max_workers: Optional[int] = None,
+                         batch_size: int = 8) -> List[Tuple[Receipt, Optional[Exception]]]:
+        """
+        Process a batch of receipts, decoding and extracting them in parallel
+        on the process-wide analysis pool. The batch is split for at most
+        max_workers workers (default: one per CPU). Results are merged
+        back in upload order. Returns (receipt, error) pairs where error is
+        None for receipts that succeeded.
+        """
+        requests = [_analysis_request(receipt) for receipt in receipts]
+        if len(receipts) <= 1:
+            analyses = analyze_receipts(requests)
+        else:
+            # Spread receipts over the workers in micro-batches for the entity model
+            num_workers = max_workers or os.cpu_count() or 1
+            chunk_size = max(1, min(batch_size, -(-len(requests) // num_workers)))
+            pool = get_analysis_pool()
+            try:
+                futures = [
+                    pool.submit(analyze_receipts, requests[start:start + chunk_size])
+                    for start in range(0, len(requests), chunk_size)
+                ]
+            except BrokenProcessPool:
+                # A worker died during an earlier batch
+                discard_analysis_pool(pool)
+                pool = get_analysis_pool()
+                futures = [
+                    pool.submit(analyze_receipts, requests[start:start + chunk_size])
+                    for start in range(0, len(requests), chunk_size)
+                ]
+            analyses = []
+            for future, start in zip(futures, range(0, len(requests), chunk_size)):
+                try:
+                    analyses.extend(future.result())
+                except Exception as e:
+                    analyses.extend([e] * len(requests[start:start + chunk_size]))
+                    if isinstance(e, BrokenProcessPool):
+                        discard_analysis_pool(pool)
+        
+        results = []
+        for receipt, analysis in zip(receipts, analyses):
+            if isinstance(analysis, Exception):
+                results.append((receipt, analysis))
+            else:
+                self.apply_analysis(receipt, analysis, customer_id)
+                results.append((receipt, None))
+        return results
+    
+    def apply_analysis(self, receipt: Receipt, analysis: dict, customer_id=None):
+        """Copy the output of analyze_receipt onto the receipt and attach it to the customer"""
+        receipt.ocr_text = analysis["ocr_text"]
+        receipt.ingredients = analysis["ingredients"]
+        receipt.shelf_life = analysis["shelf_life"]
+        receipt.ingredient_expiry = analysis["ingredient_expiry"]
+        receipt.entities = analysis.get("entities", [])
+        receipt.version += 1
+        if analysis["thumbnails"]:
+            store = get_blob_store()
+            receipt.thumbnail_refs = {size: store.put(data) for size, data in analysis["thumbnails"].items()}
+        
+        # Associate receipt with customer if provided
+        if customer_id and self.get_customer(customer_id) is not None:
+            self._changed_receipts[(customer_id, receipt.receipt_id)] = (customer_id, receipt)
+            self.recommendation_cache.invalidate(customer_id)
+            if self.database is None:
+                self.receipts[customer_id].append(receipt)
+                self.expiry_index.add(customer_id, receipt)
+            self._schedule_reminders(customer_id, receipt)
+        
+    def recompute_expiry(self, storage: str = "fridge", table: Optional[ShelfLifeTable] = None,
+                         batch_size: int = 10000):
+        """
+        Recompute per-ingredient expiry dates for every receipt, e.g. after the
+        shelf-life table was revised. The line items of batch_size receipts
+        are computed in one vectorized pass. With a database, receipts are
+        streamed from it and each batch is written back before the next.
+        """
+        table = table or get_shelf_life_table()
+        rows = self._iter_receipts()
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            upload_dates = [receipt.upload_date for _, receipt in batch for _ in receipt.ingredients]
+            ingredients = [ingredient for _, receipt in batch for ingredient in receipt.ingredients]
+            expiry_dates = table.expiry_dates(upload_dates, ingredients, storage).tolist()
+            
+            position = 0
+            for customer_id, receipt in batch:
+                receipt_expiry = expiry_dates[position:position + len(receipt.ingredients)]
+                position += len(receipt.ingredients)
+                receipt.ingredient_expiry = dict(zip(receipt.ingredients, receipt_expiry))
+                if receipt_expiry:
+                    receipt.shelf_life = min(receipt_expiry)
+                self._receipt_updated(customer_id, receipt)
+                self._schedule_reminders(customer_id, receipt)
+            if self.database is not None:
+                self.database.write_changes(self.pop_changes())
+        
+        if self.database is None:
+            self.expiry_index.rebuild(self.receipts)
+    
+    def get_thumbnail(self, customer_id: str, receipt: Receipt, size: int = THUMBNAIL_SIZES[0]) -> Optional[bytes]:
+        """A receipt's thumbnail; previews generated on demand are recorded as a change to the receipt"""
+        generated = size not in receipt.thumbnail_refs
+        thumbnail = receipt.get_thumbnail(size)
+        if generated and size in receipt.thumbnail_refs:
+            self._receipt_updated(customer_id, receipt)
+        return thumbnail
+    
+    def _receipt_updated(self, customer_id: str, receipt: Receipt):
+        """Record a change to a receipt, so the next pop_changes includes it"""
+        receipt.version += 1
+        key = (customer_id, receipt.receipt_id)
+        if key not in self._changed_receipts:
+            self._updated_receipts[key] = (customer_id, receipt)
+    
+    def _schedule_reminders(self, customer_id: str, receipt: Receipt):
+        """Schedule a reminder ahead of each ingredient's expiry, replacing earlier ones"""
+        now = datetime.now()
+        expiry_dates = receipt.ingredient_expiry or dict.fromkeys(receipt.ingredients, receipt.shelf_life)
+        for ingredient, expiry in expiry_dates.items():
+            reminder_id = (customer_id, receipt.receipt_id, ingredient)
+            if expiry <= now:
+                self.reminders.cancel(reminder_id)
+                continue
+            self.reminders.schedule(reminder_id, expiry - self.reminder_lead_time, {
+                "customer_id": customer_id,
+                "receipt_id": receipt.receipt_id,
+                "ingredient": ingredient,
+                "purchased": receipt.upload_date,
+                "expiry": expiry
+            })
+    
+    def get_recommendations(self, customer: Customer, k: int = 3,
+                            max_distance_km: Optional[float] = None) -> List[MenuItem]:
+        """
+        Generate personalized recommendations for a customer based on
+        their purchase history, preferences, and item shelf life. With
+        max_distance_km, only items from stores within that distance of
+        the customer's location are considered.
+        """
+        if not self.menu_items or k <= 0:
+            return []
+        
+        # Receipts are only ever appended, so their count stands in for their ingredients
+        fingerprint = (
+            k,
+            tuple(customer.favorite_food),
+            self.count_receipts(customer.customer_id),
+            self.catalog_version,
+            max_distance_km,
+            customer.location
+        )
+        cached = self.recommendation_cache.get(customer.customer_id, fingerprint)
+        if cached is not None:
+            return cached
+        
+        allowed_positions = None
+        if max_distance_km is not None and customer.location:
+            allowed_positions = set()
+            for _, store in self.store_locator.within(*customer.location, max_distance_km):
+                allowed_positions.update(self.store_positions[store.store_id])
+        
+        recommendations = self._compute_recommendations(customer, k, allowed_positions)
+        self.recommendation_cache.put(customer.customer_id, fingerprint, recommendations)
+        return recommendations
+    
+    def _compute_recommendations(self, customer: Customer, k: int,
+                                 allowed_positions: Optional[set] = None) -> List[MenuItem]:
+        customer_ingredients = self._customer_ingredients(customer)
+        
+        # Count matching ingredients for every menu item reachable from the index
+        match_counts = {}
+        for ingredient in customer_ingredients:
+            for position in self.ingredient_index.get(ingredient, ()):
+                if allowed_positions is None or position in allowed_positions:
+                    match_counts[position] = match_counts.get(position, 0) + 1
+        
+        if allowed_positions is not None and not allowed_positions:
+            return []  # No store close enough
+        elif match_counts:
+            # Return up to k matching items, prioritizing those with more matching ingredients
+            top = heapq.nsmallest(
+                k, match_counts,
+                key=lambda position: (-match_counts[position],) + self._tie_break_key(position)
+            )
+            return [self.menu_items[position] for position in top]
+        else:
+            # If no matches found, return random items
+            return self._random_recommendations(k, allowed_positions)
+    
+    def get_batch_recommendations(self, customers=None, k: int = 3,
+                                  chunk_size: int = 256) -> dict:
+        """
+        Generate recommendations for many customers at once (e.g. for email
+        campaigns). The ingredient x menu item matrix is kept sparse, as the
+        posting lists packed into one array (CSR). Match counts for a chunk
+        of customers are the product of their ingredient rows with it,
+        computed by gathering the posting lists of their ingredients and
+        counting hits per item with a single bincount. Returns a dict
+        mapping customer_id to a list of up to k menu items, ranked like
+        get_recommendations. customers may be any iterable and defaults to
+        all customers, streamed from the database if there is one.
+        """
+        if customers is None:
+            customers = self.iter_customers()
+        if not self.menu_items or k <= 0:
+            return {customer.customer_id: [] for customer in customers}
+        
+        # Menu item positions for ingredient row r are indices[indptr[r]:indptr[r + 1]]
+        columns = {ingredient: column for column, ingredient in enumerate(self.ingredient_index)}
+        indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+        np.cumsum([len(positions) for positions in self.ingredient_index.values()], out=indptr[1:])
+        indices = np.array([position for positions in self.ingredient_index.values() for position in positions],
+                           dtype=np.int64)
+        
+        num_items = len(self.menu_items)
+        tie_break_ranks = np.empty(num_items, dtype=np.int64)
+        tie_break_ranks[sorted(range(num_items), key=self._tie_break_key)] = np.arange(num_items)
+        top = min(k, num_items)
+        
+        recommendations = {}
+        customers = iter(customers)
+        while True:
+            chunk = list(itertools.islice(customers, chunk_size))
+            if not chunk:
+                break
+            # Each hit is recorded as row * num_items + position, so one bincount fills the whole chunk
+            hits = [np.empty(0, dtype=np.int64)]
+            for row, customer in enumerate(chunk):
+                for ingredient in self._customer_ingredients(customer):
+                    column = columns.get(ingredient)
+                    if column is not None:
+                        hits.append(indices[indptr[column]:indptr[column + 1]] + row * num_items)
+            match_counts = np.bincount(np.concatenate(hits), minlength=len(chunk) * num_items)
+            match_counts = match_counts.reshape(len(chunk), num_items)
+            
+            # Rank by match count, then the tie-break order, using a single integer key
+            rank_keys = match_counts * num_items - tie_break_ranks
+            candidates = np.argpartition(-rank_keys, top - 1, axis=1)[:, :top]
+            order = np.argsort(-np.take_along_axis(rank_keys, candidates, axis=1), axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
             
-        self.stores.append(store)
+            for row, customer in enumerate(chunk):
+                matched = [position for position in candidates[row] if match_counts[row, position] > 0]
+                if matched:
+                    recommendations[customer.customer_id] = [self.menu_items[position] for position in matched]
+                else:
+                    recommendations[customer.customer_id] = self._random_recommendations(k)
+        
+        return recommendations
     
-    def process_receipt(self, receipt: Receipt, customer_id=None):
+    def _customer_ingredients(self, customer: Customer) -> set:
+        """Collect the customer's favorite foods and all ingredients from their receipts"""
+        return set(customer.favorite_food) | self.purchased_ingredients(customer.customer_id)
+    
+    def _tie_break_key(self, position: int) -> tuple:
+        """Deterministic order for items with the same number of matches: cheapest first"""
+        item = self.menu_items[position]
+        return (item.price, item.item_id, position)
+    
+    def _random_recommendations(self, k: int = 3, allowed_positions: Optional[set] = None) -> List[MenuItem]:
+        if allowed_positions is None:
+            candidates = self.menu_items
+        else:
+            candidates = [self.menu_items[position] for position in sorted(allowed_positions)]
+        num_recommendations = min(len(candidates), random.randint(1, k))
+        return random.sample(candidates, num_recommendations)
+    
+    def has_changes(self) -> bool:
+        return bool(self._changed_customers or self._changed_stores or self._changed_receipts or self._updated_receipts)
+    
+    def pop_changes(self) -> dict:
         """
-        Process a receipt by extracting text, identifying ingredients,
-        and calculating shelf life
+        Serialize only the entities added or modified since the last call,
+        in the same shape as to_dict, and reset change tracking. Receipts
+        modified after they were added are listed under updated_receipts.
         """
-        # Simulate OCR and ingredient extraction
-        # In a real system, this would use actual OCR and NLP
-        sample_ingredients = ["beef", "chicken", "lettuce", "tomato", 
-                              "cheese", "bread", "milk", "eggs", "rice", "pasta"]
+        changes = {
+            "customers": [c.to_dict() for c in self._changed_customers.values()],
+            "stores": [s.to_dict() for s in self._changed_stores.values()],
+            "receipts": {customer_id: [] for customer_id in self._changed_customers},
+            "updated_receipts": {}
+        }
+        for customer_id, receipt in self._changed_receipts.values():
+            changes["receipts"].setdefault(customer_id, []).append(receipt.to_dict())
+        for customer_id, receipt in self._updated_receipts.values():
+            changes["updated_receipts"].setdefault(customer_id, []).append(receipt.to_dict())
         
-        # Randomly select 2-5 ingredients from the sample list
-        num_ingredients = random.randint(2, 5)
-        receipt.ingredients = random.sample(sample_ingredients, num_ingredients)
+        self.clear_changes()
+        return changes
+    
+    def clear_changes(self):
+        """Forget tracked changes without serializing them"""
+        self._changed_customers = {}
+        self._changed_stores = {}
+        self._changed_receipts = {}
+        self._updated_receipts = {}
+    
+    def to_dict(self):
+        customers = [c.to_dict() for c in self.iter_customers()]
+        receipts = {customer["customer_id"]: [] for customer in customers}
+        for customer_id, receipt in self._iter_receipts():
+            receipts.setdefault(customer_id, []).append(receipt.to_dict())
+        return {
+            "customers": customers,
+            "stores": [s.to_dict() for s in self.stores],
+            "receipts": receipts
+        }
+    
+    def save_snapshot(self, path: str):
+        """
+        Write the system as columnar Parquet tables in the directory path.
+        Receipt images stay in the blob store and are referenced by digest.
+        """
+        os.makedirs(path, exist_ok=True)
+        customers = list(self.iter_customers())
+        pd.DataFrame({
+            "customer_id": [c.customer_id for c in customers],
+            "email": [c.email for c in customers],
+            "birthdate": [c.birthdate for c in customers],
+            "gender": [c.gender for c in customers],
+            "address": [c.address for c in customers],
+            "favorite_food": [list(c.favorite_food) for c in customers],
+            "location": [list(c.location) if c.location else None for c in customers]
+        }).to_parquet(os.path.join(path, "customers.parquet"), index=False)
         
-        # Generate some fake OCR text
-        receipt.ocr_text = f"Receipt #{receipt.receipt_id}\n"
-        receipt.ocr_text += f"Date: {receipt.upload_date.strftime('%Y-%m-%d')}\n"
-        receipt.ocr_text += "Items:\n"
-        for ingredient in receipt.ingredients:
-            receipt.ocr_text += f"- {ingredient.capitalize()} ${random.uniform(1.99, 15.99):.2f}\n"
+        pd.DataFrame({
+            "store_id": [s.store_id for s in self.stores],
+            "name": [s.name for s in self.stores],
+            "location": [list(s.location) for s in self.stores]
+        }).to_parquet(os.path.join(path, "stores.parquet"), index=False)
         
-        # Calculate shelf life based on ingredients (simplified)
-        # In a real system, this would use a more sophisticated algorithm
-        shelf_life_days = 7  # Default shelf life is 7 days
-        if "milk" in receipt.ingredients or "eggs" in receipt.ingredients:
-            shelf_life_days = 3  # Dairy products have shorter shelf life
+        menu_rows = [(store.store_id, item) for store in self.stores for item in store.menu_items]
+        pd.DataFrame({
+            "store_id": [store_id for store_id, _ in menu_rows],
+            "item_id": [item.item_id for _, item in menu_rows],
+            "name": [item.name for _, item in menu_rows],
+            "ingredients": [list(item.ingredients) for _, item in menu_rows],
+            "price": [item.price for _, item in menu_rows]
+        }).to_parquet(os.path.join(path, "menu_items.parquet"), index=False)
         
-        receipt.shelf_life = receipt.upload_date + timedelta(days=shelf_life_days)
+        receipt_rows = list(self._iter_receipts())
+        thumbnail_sizes = sorted({size for _, receipt in receipt_rows for size in receipt.thumbnail_refs})
+        receipts = pd.DataFrame({
+            "customer_id": [customer_id for customer_id, _ in receipt_rows],
+            "receipt_id": [receipt.receipt_id for _, receipt in receipt_rows],
+            "upload_date": [receipt.upload_date for _, receipt in receipt_rows],
+            "image_ref": [receipt.image_ref for _, receipt in receipt_rows],
+            "ocr_text": [receipt.ocr_text for _, receipt in receipt_rows],
+            "quantity": [receipt.quantity for _, receipt in receipt_rows],
+            "shelf_life": [receipt.shelf_life for _, receipt in receipt_rows],
+            "entities": [json.dumps(receipt.entities) for _, receipt in receipt_rows],
+            "version": [receipt.version for _, receipt in receipt_rows]
+        })
+        for size in thumbnail_sizes:
+            receipts[f"thumbnail_{size}"] = [receipt.thumbnail_refs.get(size) for _, receipt in receipt_rows]
+        receipts.to_parquet(os.path.join(path, "receipts.parquet"), index=False)
         
-        # Associate receipt with customer if provided
-        if customer_id and customer_id in self.receipts:
-            self.receipts[customer_id].append(receipt)
+        # One row per receipt ingredient, pointing back at the receipt's row
+        pd.DataFrame({
+            "receipt": [row for row, (_, receipt) in enumerate(receipt_rows) for _ in receipt.ingredients],
+            "ingredient": [ingredient for _, receipt in receipt_rows for ingredient in receipt.ingredients],
+            "expiry": [receipt.ingredient_expiry.get(ingredient) for _, receipt in receipt_rows
+                       for ingredient in receipt.ingredients]
+        }).to_parquet(os.path.join(path, "receipt_ingredients.parquet"), index=False)
+    
+    @classmethod
+    def load_snapshot(cls, path: str):
+        """Rebuild a system from the tables written by save_snapshot"""
+        def read(name):
+            return pd.read_parquet(os.path.join(path, f"{name}.parquet"))
+        
+        def datetimes(column):
+            # datetime64[us] converts straight to datetime objects
+            return column.to_numpy(dtype="datetime64[us]").astype(object).tolist()
+        
+        system = cls()
+        
+        menu_items = {}  # Map store_id to its menu items
+        table = read("menu_items")
+        for store_id, item_id, name, ingredients, price in zip(
+                table["store_id"], table["item_id"], table["name"], table["ingredients"], table["price"].tolist()):
+            menu_items.setdefault(store_id, []).append(MenuItem(item_id, name, ingredients.tolist(), price))
+        
+        table = read("stores")
+        for store_id, name, location in zip(table["store_id"], table["name"], table["location"]):
+            system.add_store(Store(store_id, name, tuple(location.tolist()), menu_items.get(store_id, [])))
         
-    def get_recommendations(self, customer: Customer) -> List[MenuItem]:
+        table = read("customers")
+        for customer_id, email, birthdate, gender, address, favorite_food, location in zip(
+                table["customer_id"], table["email"], datetimes(table["birthdate"]),
+                table["gender"], table["address"], table["favorite_food"],
+                table["location"] if "location" in table else [None] * len(table)):
+            system.register_customer(Customer(customer_id, email, birthdate, gender, address, favorite_food.tolist(),
+                                              tuple(location.tolist()) if location is not None else None))
+        
+        table = read("receipt_ingredients")
+        rows = table["receipt"].to_numpy(dtype=np.int64)
+        order = np.argsort(rows, kind="stable")
+        ingredients = table["ingredient"].to_numpy()[order].tolist()
+        expiry_dates = np.asarray(datetimes(table["expiry"]), dtype=object)[order].tolist()
+        
+        table = read("receipts")
+        # Offsets of each receipt's ingredients in the sorted line items
+        offsets = np.zeros(len(table) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(table)), out=offsets[1:])
+        thumbnail_columns = {int(column.split("_")[1]): table[column].tolist()
+                             for column in table.columns if column.startswith("thumbnail_")}
+        receipt_columns = zip(
+            table["customer_id"], table["receipt_id"], datetimes(table["upload_date"]), table["image_ref"],
+            table["ocr_text"], table["quantity"].tolist(), datetimes(table["shelf_life"]), table["entities"],
+            table["version"].tolist() if "version" in table else [0] * len(table)
+        )
+        for row, (customer_id, receipt_id, upload_date, image_ref, ocr_text, quantity, shelf_life, entities,
+                  version) in enumerate(receipt_columns):
+            start, end = offsets[row], offsets[row + 1]
+            receipt_ingredients = ingredients[start:end]
+            receipt = Receipt(
+                receipt_id=receipt_id,
+                upload_date=upload_date,
+                image_data=None,
+                ocr_text=ocr_text,
+                ingredients=receipt_ingredients,
+                quantity=quantity,
+                shelf_life=shelf_life,
+                image_ref=image_ref,
+                thumbnail_refs={size: refs[row] for size, refs in thumbnail_columns.items() if refs[row]},
+                entities=json.loads(entities),
+                ingredient_expiry={
+                    ingredient: expiry
+                    for ingredient, expiry in zip(receipt_ingredients, expiry_dates[start:end]) if expiry
+                },
+                version=version
+            )
+            system.receipts.setdefault(customer_id, []).append(receipt)
+        
+        system._finish_loading()
+        return system
+    
+    def iter_records(self):
+        """Yield every store, customer and receipt as DumpRecords, e.g. for write_jsonl"""
+        for store in self.stores:
+            yield DumpRecord("store", store, None)
+        for customer in self.iter_customers():
+            yield DumpRecord("customer", customer, None)
+        for customer_id, receipt in self._iter_receipts():
+            yield DumpRecord("receipt", receipt, customer_id)
+    
+    @classmethod
+    def from_records(cls, records):
         """
-        Generate personalized recommendations for a customer based on
-        their purchase history, preferences, and item shelf life
+        Build a system from a stream of DumpRecords, inserting each as it
+        arrives. To load a stream into a database, use write_records.
+        Receipts must follow their customer, and a record that duplicates
+        an ID raises ValueError naming its line, like read_jsonl does.
         """
-        all_menu_items = []
-        for store in self.stores:
-            all_menu_items.extend(store.menu_items)
-            
-        if not all_menu_items:
-            return []
+        system = cls()
+        receipt_ids = set()  # (customer_id, receipt_id) of the receipts seen so far
+        for number, record in enumerate(records, start=1):
+            line_number = record.line_number or number
+            try:
+                if record.kind == "store":
+                    system.add_store(record.entity)
+                elif record.kind == "customer":
+                    system.register_customer(record.entity)
+                elif record.customer_id not in system.receipts:
+                    raise ValueError(f"receipt {record.entity.receipt_id} is for unknown customer {record.customer_id}")
+                elif (record.customer_id, record.entity.receipt_id) in receipt_ids:
+                    raise ValueError(f"receipt {record.entity.receipt_id} of customer {record.customer_id} already exists")
+                else:
+                    receipt_ids.add((record.customer_id, record.entity.receipt_id))
+                    system.receipts[record.customer_id].append(record.entity)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: {e}") from e
         
-        # Get customer's receipts and extract all ingredients
-        customer_ingredients = set(customer.favorite_food)
-        if customer.customer_id in self.receipts:
-            for receipt in self.receipts[customer.customer_id]:
-                customer_ingredients.update(receipt.ingredients)
-        
-        # Find menu items that match the customer's ingredients
-        matching_items = []
-        for item in all_menu_items:
-            if any(ingredient in item.ingredients for ingredient in customer_ingredients):
-                matching_items.append(item)
-        
-        if matching_items:
-            # Return up to 3 matching items, prioritizing those with more matching ingredients
-            matching_items.sort(key=lambda x: sum(1 for ing in customer_ingredients if ing in x.ingredients), reverse=True)
-            return matching_items[:3]
-        else:
-            # If no matches found, return random items
-            num_recommendations = min(len(all_menu_items), random.randint(1, 3))
-            return random.sample(all_menu_items, num_recommendations)
+        system._finish_loading()
+        return system
     
-    def to_dict(self):
-        return {
-            "customers": [c.to_dict() for c in self.customers],
-            "stores": [s.to_dict() for s in self.stores],
-            "receipts": {
-                customer_id: [r.to_dict() for r in receipts] 
-                for customer_id, receipts in self.receipts.items()
-            }
-        }
+    def _finish_loading(self):
+        """Build the derived indexes after receipts were loaded in bulk"""
+        self.expiry_index.rebuild(self.receipts)
+        self._schedule_all_reminders()
+        
+        # Everything loaded is already persisted
+        self.clear_changes()
+    
+    def _schedule_all_reminders(self):
+        for customer_id, receipt in self._iter_receipts():
+            self._schedule_reminders(customer_id, receipt)
+    
+    @classmethod
+    def from_database(cls, database: ReceiptDatabase, reminders: Optional[ReminderScheduler] = None):
+        """A system on the shared database. Only the store catalog is loaded up front."""
+        system = cls(database, reminders)
+        system.refresh_catalog()
+        return system
     
     @classmethod
     def from_dict(cls, data):
@@ -242,17 +2569,18 @@ class ReceiptSystem:
         # Load stores first
         for store_data in data.get("stores", []):
             store = Store.from_dict(store_data)
-            system.stores.append(store)
+            system.add_store(store)
         
         # Load customers
         for customer_data in data.get("customers", []):
             customer = Customer.from_dict(customer_data)
-            system.customers.append(customer)
+            system.register_customer(customer)
         
         # Load receipts
         for customer_id, receipts_data in data.get("receipts", {}).items():
             system.receipts[customer_id] = [Receipt.from_dict(r) for r in receipts_data]
         
+        system._finish_loading()
         return system
 
 def load_sample_data():
@@ -281,7 +2609,8 @@ def load_sample_data():
         birthdate=datetime(1990, 1, 1),
         gender="Other",
         address="123 Main St",
-        favorite_food=["cheese", "chicken"]
+        favorite_food=["cheese", "chicken"],
+        location=(40.7306, -73.9866)
     )
     system.register_customer(sample_customer)
 
@@ -318,19 +2647,540 @@ def create_sample_image():
     return img_byte_arr
 
 def save_system_state(system):
-    """Save the current system state to session_state"""
-    st.session_state['system_data'] = system.to_dict()
+    """Keep the live system in session_state, writing its changes through to the database if there is one"""
+    st.session_state['system'] = system
+    if system.database is not None:
+        if system.has_changes():
+            try:
+                system.database.write_changes(system.pop_changes())
+            except ValueError as e:
+                st.error(str(e))
+    else:
+        # The live objects are the session's only copy, so there is nothing to write
+        system.clear_changes()
+
+def get_job_queue():
+    """Return this session's background receipt processing queue"""
+    if 'receipt_jobs' not in st.session_state:
+        st.session_state['receipt_jobs'] = ReceiptJobQueue()
+    return st.session_state['receipt_jobs']
+
+def apply_completed_jobs(system, job_queue) -> int:
+    """Merge receipts processed in the background into the system and return how many were merged"""
+    count = 0
+    for job in job_queue.collect():
+        if job.status == "done":
+            system.apply_analysis(job.receipt, job.analysis, job.customer_id)
+            count += 1
+    return count
+
+def sync_completed_jobs(system):
+    """
+    Merge and save finished background jobs. Panels that read receipts
+    call this first, since a fragment rerun skips main().
+    """
+    if apply_completed_jobs(system, get_job_queue()):
+        save_system_state(system)
+
+def show_job_status(jobs, key: str = "refresh_jobs"):
+    """Render a status table for background receipt jobs with a refresh button"""
+    st.dataframe([
+        {
+            "Job": job.job_id,
+            "Receipt ID": job.receipt.receipt_id,
+            "Submitted": job.submitted_at.strftime('%H:%M:%S'),
+            "Status": job.status,
+            "Error": str(job.error) if job.error else ""
+        }
+        for job in reversed(jobs)
+    ], hide_index=True)
+    if st.button("Refresh Status", key=key):
+        st.rerun()
 
 def load_system_state():
     """Load the system state from session_state or initialize new system"""
-    if 'system_data' in st.session_state:
-        return ReceiptSystem.from_dict(st.session_state['system_data'])
+    database = get_database()
+    if 'system' in st.session_state:
+        system = st.session_state['system']
+        system.refresh_catalog()
+        return system
+    elif database is not None:
+        if database.is_empty():
+            # A new database starts with the sample data
+            try:
+                database.write_changes(load_sample_data().pop_changes())
+            except ValueError:
+                pass  # Another session seeded it first
+        # Sessions on the shared database share its reminders, delivered once per process
+        return ReceiptSystem.from_database(database, get_reminder_scheduler())
+    else:
+        system = load_sample_data()
+        get_reminder_ticker().add(system.reminders)
+        return system
+
+def show_page_selector(total: int, page_size: int, key: str, noun: str = "items") -> int:
+    """Render a page picker for a list of total entries and return the offset of the chosen page"""
+    num_pages = max(1, -(-total // page_size))
+    page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, key=key) if num_pages > 1 else 1
+    offset = (page - 1) * page_size
+    if total:
+        st.caption(f"Showing {offset + 1}-{min(total, offset + page_size)} of {total} {noun}")
     else:
-        return load_sample_data()
+        st.caption(f"No {noun} found")
+    return offset
+
+def show_panel(panel, system):
+    """
+    Run a page region as a Streamlit fragment, so interacting with its
+    widgets reruns only that region instead of main(). Panels that change
+    the system save it themselves, since main() won't run after them.
+    """
+    st.fragment(panel)(system)
+
+FOOD_ICON_URL = "https://cdn-icons-png.flaticon.com/512/1147/1147805.png"
+
+class FragmentCache:
+    """
+    LRU cache of rendered HTML fragments. Keys name an entity and its
+    version, so a fragment is only rebuilt after the entity changed.
+    """
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._fragments = OrderedDict()
+    
+    def render(self, key: tuple, render) -> str:
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            return fragment
+        
+        fragment = render()
+        self._fragments[key] = fragment
+        if len(self._fragments) > self.maxsize:
+            self._fragments.popitem(last=False)
+        return fragment
+
+def get_fragment_cache() -> FragmentCache:
+    """Return this session's cache of rendered HTML fragments"""
+    if 'html_fragments' not in st.session_state:
+        st.session_state['html_fragments'] = FragmentCache()
+    return st.session_state['html_fragments']
+
+# The render_* functions build escaped HTML for one list entry. Pages join
+# the entries of a section and emit them with a single st.markdown call.
+
+def render_badges(labels, highlighted=()) -> str:
+    """Ingredient badges, green for highlighted labels and blue otherwise"""
+    return "".join(
+        f'<span class="badge {"badge-green" if label in highlighted else "badge-blue"}">{html.escape(label)}</span>'
+        for label in labels
+    )
+
+def render_menu_item(item: MenuItem, version: int, highlighted=frozenset(), notes: tuple = ()) -> str:
+    """Product card for a menu item with its ingredient badges and optional notes"""
+    highlighted = frozenset(highlighted)
+    
+    def render():
+        notes_html = "".join(f'<div class="product-note">{html.escape(note)}</div>' for note in notes)
+        return (
+            f'<div class="product-card"><img src="{FOOD_ICON_URL}" class="product-image">'
+            f'<div class="product-details"><div class="product-name">{html.escape(item.name)}</div>'
+            f'<div class="product-price">${item.price:.2f}</div>'
+            f'{render_badges(item.ingredients, highlighted)}{notes_html}</div></div>'
+        )
+    return get_fragment_cache().render(("menu_item", item.item_id, version, highlighted, notes), render)
+
+def render_store_card(store: Store, version: int, distance: Optional[float] = None) -> str:
+    distance_text = f"{distance:.1f} km" if distance is not None else None
+    
+    def render():
+        distance_html = f"<p><strong>Distance:</strong> {distance_text}</p>" if distance_text else ""
+        return (
+            f"<div class='card'><h3>{html.escape(store.name)}</h3>"
+            f"<p><strong>Location:</strong> {html.escape(', '.join(map(str, store.location)))}</p>"
+            f"{distance_html}<p><strong>Available Items:</strong> {len(store.menu_items)}</p></div>"
+        )
+    return get_fragment_cache().render(("store", store.store_id, version, distance_text), render)
+
+def render_receipt_card(receipt: Receipt) -> str:
+    """Receipt summary next to its thumbnail, which is served separately by st.image"""
+    today = datetime.now().date()
+    
+    def render():
+        ingredient_expiry = receipt.ingredient_expiry
+        badges = "".join(
+            f'<span class="badge badge-blue">{html.escape(ingredient)}'
+            f'{" · " + ingredient_expiry[ingredient].strftime("%b %d") if ingredient in ingredient_expiry else ""}</span>'
+            for ingredient in receipt.ingredients
+        )
+        
+        # Display shelf life with appropriate color
+        days_remaining = (receipt.shelf_life.date() - today).days
+        shelf_life = receipt.shelf_life.strftime('%Y-%m-%d')
+        if days_remaining > 3:
+            shelf_life_html = f'<div class="shelf-life shelf-life-ok"><strong>Shelf Life Until:</strong> {shelf_life} ({days_remaining} days remaining)</div>'
+        elif days_remaining > 0:
+            shelf_life_html = f'<div class="shelf-life shelf-life-soon"><strong>Shelf Life Until:</strong> {shelf_life} (Only {days_remaining} days remaining!)</div>'
+        else:
+            shelf_life_html = f'<div class="shelf-life shelf-life-past"><strong>Shelf Life Until:</strong> {shelf_life} (Past shelf life!)</div>'
+        
+        return (
+            f'<div class="receipt-card"><div class="receipt-details">'
+            f'<h4>Receipt {html.escape(receipt.receipt_id)}</h4>'
+            f'<p><strong>Upload Date:</strong> {receipt.upload_date.strftime("%Y-%m-%d")}</p>'
+            f'<p><strong>Ingredients:</strong></p><div>{badges}</div>{shelf_life_html}</div></div>'
+        )
+    return get_fragment_cache().render(("receipt", receipt.receipt_id, receipt.upload_date, receipt.version, today),
+                                       render)
+
+def render_expiry_item(entry: ExpiryEntry) -> str:
+    today = datetime.now().date()
+    
+    def render():
+        days = (entry.expiry.date() - today).days
+        if days < 0:
+            day_text = "Expired"
+        elif days == 0:
+            day_text = "Today"
+        elif days == 1:
+            day_text = "Tomorrow"
+        else:
+            day_text = f"In {days} days"
+        return (
+            f"<div class='{expiry_status(days)} expiry-item'><img src='{FOOD_ICON_URL}' class='food-icon' />"
+            f"<div class='food-name'>{html.escape(entry.ingredient.capitalize())}</div>"
+            f"<div class='food-date'>{day_text}</div><button class='delete-button'>🗑️</button></div>"
+        )
+    return get_fragment_cache().render(("expiry", entry, today), render)
 
-def get_image_base64(image_data):
-    """Convert image bytes to base64 for HTML display"""
-    return base64.b64encode(image_data).decode("utf-8")
+def render_reminder(reminder: Reminder) -> str:
+    today = datetime.now().date()
+    
+    def render():
+        payload = reminder.payload
+        days = (payload["expiry"].date() - today).days
+        if days < 0:
+            badge, badge_class = "EXP", "badge-exp"
+        else:
+            badge = f"{days}D"
+            badge_class = "badge-3d" if days <= 3 else "badge-7d" if days <= 7 else "badge-14d"
+        shelf_life_days = (payload["expiry"] - payload["purchased"]).days
+        return (
+            f'<div class="reminder-card"><div style="display: flex; align-items: center;">'
+            f'<img src="{FOOD_ICON_URL}" style="width: 40px; height: 40px; margin-right: 10px;">'
+            f'<div style="flex-grow: 1;"><div style="font-weight: bold;">{html.escape(payload["ingredient"].capitalize())}</div>'
+            f'<div class="reminder-line">Purchased: {payload["purchased"].strftime("%b %d, %Y")}</div>'
+            f'<div class="reminder-line">Shelf Life: {shelf_life_days} Days</div>'
+            f'<div class="reminder-line">Expiry: {payload["expiry"].strftime("%b %d, %Y")}</div></div>'
+            f'<div class="{badge_class} expiry-badge">{badge}</div></div></div>'
+        )
+    return get_fragment_cache().render(("reminder", reminder.reminder_id, reminder.due, today), render)
+
+# Styles for the mobile app look, emitted once per full run of main()
+APP_CSS = """
+<style>
+.main-header {
+    font-size: 2.5rem;
+    color: #4CAF50;
+    text-align: center;
+    margin-bottom: 2rem;
+}
+.subheader {
+    font-size: 1.8rem;
+    color: #2E7D32;
+    margin-top: 1.5rem;
+    margin-bottom: 1rem;
+}
+.app-header {
+    background-color: #f8f8f8;
+    padding: 1rem;
+    border-radius: 15px 15px 0 0;
+    border-bottom: 1px solid #eee;
+    text-align: center;
+    font-size: 1.3rem;
+    font-weight: bold;
+}
+.card {
+    padding: 1.5rem;
+    border-radius: 10px;
+    border: 1px solid #ddd;
+    margin-bottom: 1rem;
+    background-color: #f9f9f9;
+    box-shadow: 0 2px 5px rgba(0,0,0,0.05);
+}
+.product-card {
+    padding: 0.8rem;
+    border-radius: 10px;
+    margin-bottom: 0.7rem;
+    background-color: #f9f9f9;
+    display: flex;
+    align-items: center;
+    border: 1px solid #eee;
+    transition: transform 0.2s;
+}
+.product-card:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+}
+.product-image {
+    width: 50px;
+    height: 50px;
+    border-radius: 5px;
+    margin-right: 15px;
+    object-fit: cover;
+}
+.product-details {
+    flex: 1;
+}
+.product-name {
+    font-weight: bold;
+    margin-bottom: 0.2rem;
+}
+.product-price {
+    color: #2E7D32;
+    font-weight: bold;
+    margin-bottom: 5px;
+}
+.product-note {
+    font-size: 0.9rem;
+    color: #555;
+}
+.receipt-card {
+    display: flex;
+    gap: 1.5rem;
+    padding-bottom: 1rem;
+    margin-bottom: 1rem;
+    border-bottom: 1px solid #eee;
+}
+.receipt-thumbnail {
+    width: 150px;
+    border-radius: 5px;
+    object-fit: contain;
+    align-self: flex-start;
+}
+.receipt-no-image {
+    height: 200px;
+    background-color: #f5f5f5;
+    color: #999;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+}
+.receipt-details {
+    flex: 1;
+}
+.shelf-life {
+    padding: 0.75rem 1rem;
+    border-radius: 5px;
+}
+.shelf-life-ok {
+    background-color: #E8F5E9;
+    color: #2E7D32;
+}
+.shelf-life-soon {
+    background-color: #FFF8E1;
+    color: #8D6E00;
+}
+.shelf-life-past {
+    background-color: #FDECEA;
+    color: #B71C1C;
+}
+.reminder-card {
+    padding: 0.8rem;
+    margin-bottom: 0.8rem;
+    background-color: #f9f9f9;
+    border-radius: 10px;
+    box-shadow: 0 1px 3px rgba(0,0,0,0.1);
+}
+.reminder-line {
+    font-size: 0.9rem;
+    color: #666;
+}
+.expiry-item {
+    display: flex;
+    align-items: center;
+    padding: 0.7rem 1rem;
+    border-radius: 10px;
+    margin-bottom: 0.5rem;
+    transition: all 0.2s;
+}
+.expiry-expired {
+    background: linear-gradient(to right, #f9d7da, #f8d7da);
+    border-left: 5px solid #dc3545;
+}
+.expiry-today {
+    background: linear-gradient(to right, #f9d7da, #ffecb5);
+    border-left: 5px solid #e74c3c;
+}
+.expiry-soon {
+    background: linear-gradient(to right, #ffecb5, #ffe082);
+    border-left: 5px solid #ff9800;
+}
+.expiry-week {
+    background: linear-gradient(to right, #ffe082, #dcedc8);
+    border-left: 5px solid #ffc107;
+}
+.expiry-safe {
+    background: linear-gradient(to right, #dcedc8, #c8e6c9);
+    border-left: 5px solid #4caf50;
+}
+.expiry-badge {
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    width: 40px;
+    height: 40px;
+    border-radius: 50%;
+    font-weight: bold;
+    font-size: 0.9rem;
+    margin-left: auto;
+}
+.badge-exp {
+    background-color: #bdbdbd;
+    color: white;
+}
+.badge-3d {
+    background-color: #e74c3c;
+    color: white;
+}
+.badge-7d {
+    background-color: #ff9800;
+    color: white;
+}
+.badge-14d {
+    background-color: #ffc107;
+    color: white;
+}
+.badge-152d {
+    background-color: #4caf50;
+    color: white;
+}
+.badge-77d {
+    background-color: #4caf50;
+    color: white;
+}
+.badge {
+    display: inline-block;
+    padding: 0.2rem 0.5rem;
+    border-radius: 20px;
+    font-size: 0.8rem;
+    font-weight: bold;
+    margin-right: 0.5rem;
+    margin-bottom: 0.5rem;
+}
+.badge-green {
+    background-color: #E8F5E9;
+    color: #2E7D32;
+    border: 1px solid #C8E6C9;
+}
+.badge-blue {
+    background-color: #E3F2FD;
+    color: #1565C0;
+    border: 1px solid #BBDEFB;
+}
+.category-item {
+    display: flex;
+    align-items: center;
+    padding: 0.8rem;
+    border-radius: 5px;
+    margin-bottom: 0.5rem;
+    border: 1px solid #ddd;
+    transition: background-color 0.2s;
+}
+.category-item:hover {
+    background-color: #f5f5f5;
+}
+.category-icon {
+    width: 40px;
+    height: 40px;
+    margin-right: 15px;
+    object-fit: contain;
+}
+.category-name {
+    font-size: 1.1rem;
+    color: #555;
+}
+.barcode-scanner {
+    border: 2px dashed #ddd;
+    padding: 1rem;
+    border-radius: 10px;
+    text-align: center;
+    margin-bottom: 1rem;
+}
+.food-expiry-list {
+    margin-top: 1rem;
+}
+.food-item {
+    display: flex;
+    align-items: center;
+    padding: 0.7rem 1rem;
+    border-radius: 10px;
+    margin-bottom: 0.5rem;
+    background-color: #fff;
+    border: 1px solid #eee;
+}
+.food-icon {
+    width: 30px;
+    height: 30px;
+    margin-right: 1rem;
+}
+.food-name {
+    flex: 1;
+    font-weight: 500;
+}
+.food-date {
+    margin-right: 1rem;
+}
+.delete-button {
+    color: #bbb;
+    background: transparent;
+    border: none;
+    cursor: pointer;
+}
+.add-button {
+    background-color: #e0f2e0;
+    width: 40px;
+    height: 40px;
+    border-radius: 20px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    position: fixed;
+    bottom: 20px;
+    right: 20px;
+    z-index: 100;
+    box-shadow: 0 2px 5px rgba(0,0,0,0.1);
+}
+.mobile-container {
+    max-width: 450px;
+    margin: 0 auto;
+    border: 1px solid #ddd;
+    border-radius: 20px;
+    overflow: hidden;
+    box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+}
+.app-tabs {
+    display: flex;
+    justify-content: space-around;
+    background-color: #f9f9f9;
+    padding: 0.5rem;
+    border-top: 1px solid #eee;
+}
+.app-tab {
+    padding: 0.5rem 1rem;
+    text-align: center;
+    font-size: 0.8rem;
+    color: #777;
+}
+.app-tab-active {
+    color: #4CAF50;
+    font-weight: bold;
+}
+.stButton>button {
+    width: 100%;
+}
+</style>
+"""
 
 def main():
     st.set_page_config(
@@ -340,257 +3190,19 @@ def main():
         initial_sidebar_state="expanded"
     )
     
+    if os.environ.get("RECEIPT_WARMUP", "1") == "1":
+        start_warm_up()
+    
     # Add custom CSS for better styling to match the mobile app designs
-    st.markdown("""
-    <style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #4CAF50;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .subheader {
-        font-size: 1.8rem;
-        color: #2E7D32;
-        margin-top: 1.5rem;
-        margin-bottom: 1rem;
-    }
-    .app-header {
-        background-color: #f8f8f8;
-        padding: 1rem;
-        border-radius: 15px 15px 0 0;
-        border-bottom: 1px solid #eee;
-        text-align: center;
-        font-size: 1.3rem;
-        font-weight: bold;
-    }
-    .card {
-        padding: 1.5rem;
-        border-radius: 10px;
-        border: 1px solid #ddd;
-        margin-bottom: 1rem;
-        background-color: #f9f9f9;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-    }
-    .product-card {
-        padding: 0.8rem;
-        border-radius: 10px;
-        margin-bottom: 0.7rem;
-        background-color: #f9f9f9;
-        display: flex;
-        align-items: center;
-        border: 1px solid #eee;
-        transition: transform 0.2s;
-    }
-    .product-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .product-image {
-        width: 50px;
-        height: 50px;
-        border-radius: 5px;
-        margin-right: 15px;
-        object-fit: cover;
-    }
-    .product-details {
-        flex: 1;
-    }
-    .product-name {
-        font-weight: bold;
-        margin-bottom: 0.2rem;
-    }
-    .expiry-item {
-        display: flex;
-        align-items: center;
-        padding: 0.7rem 1rem;
-        border-radius: 10px;
-        margin-bottom: 0.5rem;
-        transition: all 0.2s;
-    }
-    .expiry-expired {
-        background: linear-gradient(to right, #f9d7da, #f8d7da);
-        border-left: 5px solid #dc3545;
-    }
-    .expiry-today {
-        background: linear-gradient(to right, #f9d7da, #ffecb5);
-        border-left: 5px solid #e74c3c;
-    }
-    .expiry-soon {
-        background: linear-gradient(to right, #ffecb5, #ffe082);
-        border-left: 5px solid #ff9800;
-    }
-    .expiry-week {
-        background: linear-gradient(to right, #ffe082, #dcedc8);
-        border-left: 5px solid #ffc107;
-    }
-    .expiry-safe {
-        background: linear-gradient(to right, #dcedc8, #c8e6c9);
-        border-left: 5px solid #4caf50;
-    }
-    .expiry-badge {
-        display: flex;
-        justify-content: center;
-        align-items: center;
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        font-weight: bold;
-        font-size: 0.9rem;
-        margin-left: auto;
-    }
-    .badge-exp {
-        background-color: #bdbdbd;
-        color: white;
-    }
-    .badge-3d {
-        background-color: #e74c3c;
-        color: white;
-    }
-    .badge-7d {
-        background-color: #ff9800;
-        color: white;
-    }
-    .badge-14d {
-        background-color: #ffc107;
-        color: white;
-    }
-    .badge-152d {
-        background-color: #4caf50;
-        color: white;
-    }
-    .badge-77d {
-        background-color: #4caf50;
-        color: white;
-    }
-    .badge {
-        display: inline-block;
-        padding: 0.2rem 0.5rem;
-        border-radius: 20px;
-        font-size: 0.8rem;
-        font-weight: bold;
-        margin-right: 0.5rem;
-        margin-bottom: 0.5rem;
-    }
-    .badge-green {
-        background-color: #E8F5E9;
-        color: #2E7D32;
-        border: 1px solid #C8E6C9;
-    }
-    .badge-blue {
-        background-color: #E3F2FD;
-        color: #1565C0;
-        border: 1px solid #BBDEFB;
-    }
-    .category-item {
-        display: flex;
-        align-items: center;
-        padding: 0.8rem;
-        border-radius: 5px;
-        margin-bottom: 0.5rem;
-        border: 1px solid #ddd;
-        transition: background-color 0.2s;
-    }
-    .category-item:hover {
-        background-color: #f5f5f5;
-    }
-    .category-icon {
-        width: 40px;
-        height: 40px;
-        margin-right: 15px;
-        object-fit: contain;
-    }
-    .category-name {
-        font-size: 1.1rem;
-        color: #555;
-    }
-    .barcode-scanner {
-        border: 2px dashed #ddd;
-        padding: 1rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 1rem;
-    }
-    .food-expiry-list {
-        margin-top: 1rem;
-    }
-    .food-item {
-        display: flex;
-        align-items: center;
-        padding: 0.7rem 1rem;
-        border-radius: 10px;
-        margin-bottom: 0.5rem;
-        background-color: #fff;
-        border: 1px solid #eee;
-    }
-    .food-icon {
-        width: 30px;
-        height: 30px;
-        margin-right: 1rem;
-    }
-    .food-name {
-        flex: 1;
-        font-weight: 500;
-    }
-    .food-date {
-        margin-right: 1rem;
-    }
-    .delete-button {
-        color: #bbb;
-        background: transparent;
-        border: none;
-        cursor: pointer;
-    }
-    .add-button {
-        background-color: #e0f2e0;
-        width: 40px;
-        height: 40px;
-        border-radius: 20px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        position: fixed;
-        bottom: 20px;
-        right: 20px;
-        z-index: 100;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-    }
-    .mobile-container {
-        max-width: 450px;
-        margin: 0 auto;
-        border: 1px solid #ddd;
-        border-radius: 20px;
-        overflow: hidden;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-    }
-    .app-tabs {
-        display: flex;
-        justify-content: space-around;
-        background-color: #f9f9f9;
-        padding: 0.5rem;
-        border-top: 1px solid #eee;
-    }
-    .app-tab {
-        padding: 0.5rem 1rem;
-        text-align: center;
-        font-size: 0.8rem;
-        color: #777;
-    }
-    .app-tab-active {
-        color: #4CAF50;
-        font-weight: bold;
-    }
-    .stButton>button {
-        width: 100%;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(APP_CSS, unsafe_allow_html=True)
     
     # Title
     st.markdown("<h1 class='main-header'>Smart Receipt Processing System</h1>", unsafe_allow_html=True)
     
     # Load system
     system = load_system_state()
+    apply_completed_jobs(system, get_job_queue())
+    save_system_state(system)
     
     # Sidebar navigation
     with st.sidebar:
@@ -603,9 +3215,15 @@ def main():
         )
         
         st.divider()
+        with st.expander("Startup Timings"):
+            for name, seconds in _process.timings.items():
+                st.caption(f"{name}: {seconds:.2f}s")
+        
         if st.button("Reset Demo Data", type="secondary"):
-            st.session_state.pop('system_data', None)
-            st.experimental_rerun()
+            st.session_state.pop('system', None)
+            st.session_state.pop('receipt_jobs', None)
+            st.session_state.pop('html_fragments', None)
+            st.rerun()
     
     # Page content
     if page == "Home":
@@ -639,10 +3257,9 @@ def show_home_page(system):
     
     with col1:
         st.markdown("#### 📋 System Stats")
-        st.metric("Customers", len(system.customers))
+        st.metric("Customers", system.count_customers())
         st.metric("Stores", len(system.stores))
-        total_receipts = sum(len(receipts) for receipts in system.receipts.values())
-        st.metric("Total Receipts", total_receipts)
+        st.metric("Total Receipts", system.count_receipts())
         
         st.markdown("#### 🔄 How It Works")
         st.markdown("""
@@ -657,35 +3274,8 @@ def show_home_page(system):
         st.markdown("<div class='mobile-container'>", unsafe_allow_html=True)
         st.markdown("<div class='app-header'>Smart Receipt App</div>", unsafe_allow_html=True)
         
-        # Generate some sample expiring foods for the demo
         st.markdown("<h3 style='padding-left: 1rem; padding-top: 1rem;'>Food Expiration Dates</h3>", unsafe_allow_html=True)
-
-        foods = [
-            {"name": "Eggs", "days": 0, "status": "expiry-today"},
-            {"name": "Cheese", "days": 0, "status": "expiry-today"},
-            {"name": "Milk", "days": 1, "status": "expiry-soon"},
-            {"name": "Ham", "days": 3, "status": "expiry-soon"},
-            {"name": "Butter", "days": 7, "status": "expiry-week"},
-            {"name": "Mushrooms", "days": 14, "status": "expiry-safe"},
-            {"name": "Tomatoes", "days": 25, "status": "expiry-safe"}
-        ]
-        
-        for food in foods:
-            if food["days"] == 0:
-                day_text = "Today"
-            elif food["days"] == 1:
-                day_text = "Tomorrow"
-            else:
-                day_text = f"In {food['days']} days"
-                
-            st.markdown(f"""
-            <div class='{food["status"]} expiry-item'>
-                <img src='https://cdn-icons-png.flaticon.com/512/1147/1147805.png' class='food-icon' />
-                <div class='food-name'>{food["name"]}</div>
-                <div class='food-date'>{day_text}</div>
-                <button class='delete-button'>🗑️</button>
-            </div>
-            """, unsafe_allow_html=True)
+        show_expiry_items(get_expiring_foods(system))
         
         # Add a floating action button
         st.markdown("""
@@ -703,39 +3293,31 @@ def show_home_page(system):
 def show_food_expiry(system):
     st.markdown("<h2 class='subheader'>Food Expiry Tracking</h2>", unsafe_allow_html=True)
     
+    show_panel(food_expiry_panel, system)
+
+def food_expiry_panel(system):
+    """Expiry metrics, list and reminders for the selected customer"""
+    sync_completed_jobs(system)
+    
+    # Track one customer's food, or everything in the system
+    customer_emails = ["All customers"] + system.customer_emails()
+    selected_email = st.selectbox("Select Customer", customer_emails)
+    selected_customer = system.get_customer_by_email(selected_email)
+    customer_id = selected_customer.customer_id if selected_customer else None
+    
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    metric1, metric2, metric3 = st.columns(3)
+    metric1.metric("Expiring Today", system.count_expiring(datetime.now(), today + timedelta(days=1), customer_id))
+    metric2.metric("Expiring in 3 Days", system.count_expiring(datetime.now(), today + timedelta(days=4), customer_id))
+    metric3.metric("Expiring This Week", system.count_expiring(datetime.now(), today + timedelta(days=8), customer_id))
+    
     col1, col2 = st.columns([1, 1])
     
     with col1:
         st.markdown("<div class='mobile-container'>", unsafe_allow_html=True)
         st.markdown("<div class='app-header'>Food Expiration Dates</div>", unsafe_allow_html=True)
         
-        # Generate some sample expiring foods for the demo (similar to Image 1)
-        foods = [
-            {"name": "Eggs", "days": 0, "status": "expiry-today"},
-            {"name": "Cheese", "days": 0, "status": "expiry-today"},
-            {"name": "Milk", "days": 1, "status": "expiry-soon"},
-            {"name": "Ham", "days": 3, "status": "expiry-soon"},
-            {"name": "Butter", "days": 7, "status": "expiry-week"},
-            {"name": "Mushrooms", "days": 14, "status": "expiry-safe"},
-            {"name": "Tomatoes", "days": 25, "status": "expiry-safe"}
-        ]
-        
-        for food in foods:
-            if food["days"] == 0:
-                day_text = "Today"
-            elif food["days"] == 1:
-                day_text = "Tomorrow"
-            else:
-                day_text = f"In {food['days']} days"
-                
-            st.markdown(f"""
-            <div class='{food["status"]} expiry-item'>
-                <img src='https://cdn-icons-png.flaticon.com/512/1147/1147805.png' class='food-icon' />
-                <div class='food-name'>{food["name"]}</div>
-                <div class='food-date'>{day_text}</div>
-                <button class='delete-button'>🗑️</button>
-            </div>
-            """, unsafe_allow_html=True)
+        show_expiry_items(get_expiring_foods(system, customer_id))
         
         # Add a floating action button
         st.markdown("""
@@ -754,30 +3336,12 @@ def show_food_expiry(system):
         st.markdown("<div class='mobile-container'>", unsafe_allow_html=True)
         st.markdown("<div class='app-header'>Expiry Reminder</div>", unsafe_allow_html=True)
         
-        # Generate sample expiry reminders (similar to Image 2)
-        items = [
-            {"name": "Expired Milk", "production": "Nov 16, 2024", "shelf_life": "7 Days", "expiry": "Nov 23, 2024", "badge": "EXP", "badge_class": "badge-exp"},
-            {"name": "Fresh Yogurt", "production": "Nov 15, 2024", "shelf_life": "14 Days", "expiry": "Nov 29, 2024", "badge": "3D", "badge_class": "badge-3d"},
-            {"name": "Orange Juice", "production": "Nov 03, 2024", "shelf_life": "1 Month", "expiry": "Dec 03, 2024", "badge": "7D", "badge_class": "badge-7d"},
-            {"name": "Canned Soup", "production": "Oct 27, 2024", "shelf_life": "6 Months", "expiry": "Apr 27, 2025", "badge": "152D", "badge_class": "badge-152d"},
-            {"name": "Frozen Pizza", "production": "Nov 11, 2024", "shelf_life": "3 Months", "expiry": "Feb 11, 2025", "badge": "77D", "badge_class": "badge-77d"}
-        ]
+        reminders = [reminder for reminder in reversed(list(system.reminders.sinks[0].reminders))
+                     if customer_id is None or reminder.payload["customer_id"] == customer_id]
+        if not reminders:
+            st.info(f"No reminders sent yet. {len(system.reminders)} reminders are scheduled.")
         
-        for item in items:
-            st.markdown(f"""
-            <div style="padding: 0.8rem; margin-bottom: 0.8rem; background-color: #f9f9f9; border-radius: 10px; box-shadow: 0 1px 3px rgba(0,0,0,0.1);">
-                <div style="display: flex; align-items: center;">
-                    <img src="https://cdn-icons-png.flaticon.com/512/1147/1147805.png" style="width: 40px; height: 40px; margin-right: 10px;">
-                    <div style="flex-grow: 1;">
-                        <div style="font-weight: bold;">{item["name"]}</div>
-                        <div style="font-size: 0.9rem; color: #666;">Production: {item["production"]}</div>
-                        <div style="font-size: 0.9rem; color: #666;">Shelf Life: {item["shelf_life"]}</div>
-                        <div style="font-size: 0.9rem; color: #666;">Expiry: {item["expiry"]}</div>
-                    </div>
-                    <div class="{item["badge_class"]} expiry-badge">{item["badge"]}</div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        st.markdown("".join(render_reminder(reminder) for reminder in reminders[:20]), unsafe_allow_html=True)
         
         # Add bottom tabs
         st.markdown("""
@@ -791,77 +3355,44 @@ def show_food_expiry(system):
         
         st.markdown("</div>", unsafe_allow_html=True)
 
+def get_expiring_foods(system, customer_id=None, past_days=7, future_days=30, limit=20):
+    """Foods that expired recently or expire soon, soonest first"""
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    return system.expiring(today - timedelta(days=past_days), today + timedelta(days=future_days + 1),
+                           customer_id, limit)
+
+def expiry_status(days: int) -> str:
+    """CSS class for an item expiring in the given number of days"""
+    if days < 0:
+        return "expiry-expired"
+    elif days == 0:
+        return "expiry-today"
+    elif days <= 3:
+        return "expiry-soon"
+    elif days <= 7:
+        return "expiry-week"
+    else:
+        return "expiry-safe"
+
+def show_expiry_items(entries):
+    """Render ExpiryIndex entries as the mobile-style expiry list"""
+    if not entries:
+        st.info("No food tracked yet. Upload a receipt to start tracking expiry dates.")
+        return
+    
+    st.markdown("".join(render_expiry_item(entry) for entry in entries), unsafe_allow_html=True)
+
 def show_receipt_upload(system):
     st.markdown("<h2 class='subheader'>Receipt Upload & Processing</h2>", unsafe_allow_html=True)
     
-    if not system.customers:
+    if not system.count_customers():
         st.warning("Please register a customer first!")
         return
     
     col1, col2 = st.columns([1, 1])
     
     with col1:
-        st.markdown("<div class='card'>", unsafe_allow_html=True)
-        st.markdown("### Upload Receipt")
-        
-        # Customer selection
-        customer_emails = [c.email for c in system.customers]
-        selected_email = st.selectbox("Select Customer", customer_emails)
-        selected_customer = next((c for c in system.customers if c.email == selected_email), None)
-        
-        st.markdown("#### Scan Barcode")
-        
-        # Barcode scanner simulation
-        st.markdown("""
-        <div class='barcode-scanner'>
-            <img src="https://cdn-icons-png.flaticon.com/512/1799/1799767.png" style="width: 60px; height: 60px; margin-bottom: 10px;">
-            <p>Position the barcode within the frame to scan</p>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        with st.form("receipt_form"):
-            receipt_id = st.text_input("Receipt ID", value=f"R{sum(len(receipts) for receipts in system.receipts.values())+1}")
-            uploaded_file = st.file_uploader("Upload Receipt Image", type=['png', 'jpg', 'jpeg'])
-            quantity = st.number_input("Quantity", min_value=1, value=1)
-            
-            # Show image preview if uploaded
-            if uploaded_file:
-                try:
-                    image = Image.open(uploaded_file)
-                    st.image(image, caption="Receipt Preview", width=200)
-                except:
-                    st.error("Failed to preview image")
-            
-            submit_button = st.form_submit_button("Process Receipt")
-            
-            if submit_button:
-                if uploaded_file is None:
-                    st.error("Please upload a receipt image!")
-                else:
-                    try:
-                        # Reset buffer to start and read the file
-                        uploaded_file.seek(0)
-                        image_data = uploaded_file.read()
-                        
-                        receipt = Receipt(
-                            receipt_id=receipt_id,
-                            upload_date=datetime.now(),
-                            image_data=image_data,
-                            ocr_text="",  # Will be filled by processing
-                            ingredients=[],  # Will be filled by processing
-                            quantity=quantity,
-                            shelf_life=datetime.now()  # Will be updated after processing
-                        )
-                        
-                        # Process the receipt
-                        system.process_receipt(receipt, selected_customer.customer_id)
-                        
-                        st.success("✅ Receipt processed successfully!")
-                        
-                    except Exception as e:
-                        st.error(f"❌ Error processing receipt: {str(e)}")
-        
-        st.markdown("</div>", unsafe_allow_html=True)
+        show_panel(receipt_upload_panel, system)
     
     with col2:
         # Show a mobile app mockup of the barcode scanning interface (similar to Image 4)
@@ -904,63 +3435,192 @@ def show_receipt_upload(system):
         
         st.markdown("</div>", unsafe_allow_html=True)
 
+def receipt_upload_panel(system):
+    """Upload forms and processing status"""
+    sync_completed_jobs(system)
+    
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown("### Upload Receipt")
+    
+    # Customer selection
+    customer_emails = system.customer_emails()
+    selected_email = st.selectbox("Select Customer", customer_emails)
+    selected_customer = system.get_customer_by_email(selected_email)
+    
+    st.markdown("#### Scan Barcode")
+    
+    # Barcode scanner simulation
+    st.markdown("""
+    <div class='barcode-scanner'>
+        <img src="https://cdn-icons-png.flaticon.com/512/1799/1799767.png" style="width: 60px; height: 60px; margin-bottom: 10px;">
+        <p>Position the barcode within the frame to scan</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    with st.form("receipt_form"):
+        receipt_id = st.text_input("Receipt ID", placeholder="Leave blank to number it automatically").strip()
+        uploaded_file = st.file_uploader("Upload Receipt Image", type=['png', 'jpg', 'jpeg'])
+        quantity = st.number_input("Quantity", min_value=1, value=1)
+        
+        # Show image preview if uploaded
+        if uploaded_file:
+            try:
+                image = Image.open(uploaded_file)
+                st.image(image, caption="Receipt Preview", width=200)
+            except:
+                st.error("Failed to preview image")
+        
+        submit_button = st.form_submit_button("Process Receipt")
+        
+        if submit_button:
+            if uploaded_file is None:
+                st.error("Please upload a receipt image!")
+            elif receipt_id and system.has_receipt(selected_customer.customer_id, receipt_id):
+                st.error(f"Receipt {receipt_id} already exists for this customer!")
+            else:
+                try:
+                    # Reset buffer to start and read the file
+                    uploaded_file.seek(0)
+                    image_data = uploaded_file.read()
+                    
+                    receipt = Receipt(
+                        receipt_id=receipt_id or system.next_receipt_id(selected_customer.customer_id),
+                        upload_date=datetime.now(),
+                        image_data=image_data,
+                        ocr_text="",  # Will be filled by processing
+                        ingredients=[],  # Will be filled by processing
+                        quantity=quantity,
+                        shelf_life=datetime.now()  # Will be updated after processing
+                    )
+                    
+                    # Process the receipt in the background
+                    job_id = get_job_queue().submit(receipt, selected_customer.customer_id)
+                    
+                    st.success(f"✅ Receipt queued for processing (job {job_id})")
+                    
+                except Exception as e:
+                    st.error(f"❌ Error processing receipt: {str(e)}")
+    
+    with st.form("batch_receipt_form"):
+        st.markdown("#### Batch Upload")
+        uploaded_files = st.file_uploader("Upload Receipt Images", type=['png', 'jpg', 'jpeg'],
+                                          accept_multiple_files=True)
+        batch_submit_button = st.form_submit_button("Process All Receipts")
+        
+        if batch_submit_button:
+            if not uploaded_files:
+                st.error("Please upload at least one receipt image!")
+            else:
+                receipts = [
+                    Receipt(
+                        receipt_id=system.next_receipt_id(selected_customer.customer_id),
+                        upload_date=datetime.now(),
+                        image_data=uploaded.getvalue(),
+                        ocr_text="",
+                        ingredients=[],
+                        quantity=1,
+                        shelf_life=datetime.now()
+                    )
+                    for uploaded in uploaded_files
+                ]
+                
+                with st.spinner(f"Processing {len(receipts)} receipts..."):
+                    results = system.process_receipts(receipts, selected_customer.customer_id)
+                save_system_state(system)
+                
+                failures = [(receipt, error) for receipt, error in results if error is not None]
+                processed = len(results) - len(failures)
+                if processed:
+                    st.success(f"✅ {processed} of {len(results)} receipts processed successfully!")
+                for receipt, error in failures:
+                    st.error(f"❌ Error processing receipt {receipt.receipt_id}: {str(error)}")
+                
+                st.dataframe([
+                    {
+                        "File": uploaded.name,
+                        "Receipt ID": receipt.receipt_id,
+                        "Status": "Processed" if error is None else "Failed",
+                        "Ingredients": ", ".join(receipt.ingredients)
+                    }
+                    for uploaded, (receipt, error) in zip(uploaded_files, results)
+                ], hide_index=True)
+    
+    jobs = get_job_queue().jobs_for_customer(selected_customer.customer_id)
+    if jobs:
+        st.markdown("#### Processing Status")
+        show_job_status(jobs)
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
 def show_receipts(system):
     st.markdown("<h2 class='subheader'>Receipt History</h2>", unsafe_allow_html=True)
     
-    if not system.customers:
+    if not system.count_customers():
         st.warning("Please register a customer first!")
         return
     
+    show_panel(receipt_history_panel, system)
+
+def receipt_history_panel(system):
+    """Paged receipt history and details for the selected customer"""
+    sync_completed_jobs(system)
+    
     # Customer selection
-    customer_emails = [c.email for c in system.customers]
+    customer_emails = system.customer_emails()
     selected_email = st.selectbox("Select Customer", customer_emails)
-    selected_customer = next((c for c in system.customers if c.email == selected_email), None)
+    selected_customer = system.get_customer_by_email(selected_email)
+    
+    # Receipts still being processed in the background, and those that failed
+    job_queue = get_job_queue()
+    customer_jobs = job_queue.jobs_for_customer(selected_customer.customer_id)
+    pending_jobs = [job for job in customer_jobs if job.status in ("queued", "processing")]
+    failed_jobs = [job for job in customer_jobs if job.status == "failed"]
+    if pending_jobs:
+        st.markdown("### Receipts in Progress")
+        show_job_status(pending_jobs)
+    if failed_jobs:
+        st.markdown("### Failed Receipts")
+        show_job_status(failed_jobs, key="refresh_failed_jobs")
+        if st.button("Dismiss Failed", key="dismiss_failed_jobs"):
+            job_queue.dismiss([job.job_id for job in failed_jobs])
+            st.rerun()
     
-    if selected_customer and selected_customer.customer_id in system.receipts and system.receipts[selected_customer.customer_id]:
+    receipt_count = system.count_receipts(selected_customer.customer_id) if selected_customer else 0
+    if receipt_count:
         st.markdown(f"### Receipts for {selected_customer.email}")
         
-        receipts = system.receipts[selected_customer.customer_id]
+        # Only the receipts on the current page are loaded
+        page_size = 10
+        offset = show_page_selector(receipt_count, page_size, key="receipts_page", noun="receipts")
+        receipts = system.list_receipts(selected_customer.customer_id, offset, page_size)
         
-        # Display receipts in a more visual way
+        # Thumbnails go through st.image, which serves them by URL so the browser caches them
         for receipt in receipts:
-            with st.container():
-                col1, col2 = st.columns([1, 3])
-                
-                with col1:
-                    if receipt.image_data:
-                        st.image(receipt.image_data, caption=f"Receipt {receipt.receipt_id}", width=150)
-                    else:
-                        st.markdown("""
-                        <div style="width: 150px; height: 200px; background-color: #f5f5f5; display: flex; align-items: center; justify-content: center; border-radius: 5px;">
-                            <span style="color: #999;">No Image</span>
-                        </div>
-                        """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown(f"#### Receipt {receipt.receipt_id}")
-                    st.markdown(f"**Upload Date:** {receipt.upload_date.strftime('%Y-%m-%d')}")
-                    
-                    # Display ingredients with badges
-                    st.markdown("**Ingredients:**")
-                    ingredient_html = ""
-                    for ingredient in receipt.ingredients:
-                        ingredient_html += f'<span class="badge badge-blue">{ingredient}</span>'
-                    st.markdown(ingredient_html, unsafe_allow_html=True)
-                    
-                    # Display shelf life with appropriate color
-                    days_remaining = (receipt.shelf_life - datetime.now()).days
-                    if days_remaining > 3:
-                        st.success(f"**Shelf Life Until:** {receipt.shelf_life.strftime('%Y-%m-%d')} ({days_remaining} days remaining)")
-                    elif days_remaining > 0:
-                        st.warning(f"**Shelf Life Until:** {receipt.shelf_life.strftime('%Y-%m-%d')} (Only {days_remaining} days remaining!)")
-                    else:
-                        st.error(f"**Shelf Life Until:** {receipt.shelf_life.strftime('%Y-%m-%d')} (Past shelf life!)")
-                    
-                    # Display OCR text in an expander
-                    with st.expander("View OCR Text"):
-                        st.text(receipt.ocr_text)
-            
-            st.divider()
+            image_column, card_column = st.columns([1, 4])
+            thumbnail = system.get_thumbnail(selected_customer.customer_id, receipt, 300)
+            if thumbnail:
+                image_column.image(thumbnail, width=150)
+            else:
+                image_column.markdown('<div class="receipt-thumbnail receipt-no-image">No Image</div>',
+                                      unsafe_allow_html=True)
+            card_column.markdown(render_receipt_card(receipt), unsafe_allow_html=True)
+        
+        # Widgets for one receipt at a time instead of a set per card
+        st.markdown("### Receipt Details")
+        selected_receipt = st.selectbox("Receipt", receipts, format_func=lambda receipt: f"Receipt {receipt.receipt_id}",
+                                        key="receipt_details")
+        if selected_receipt.image_ref and st.toggle("Show original", key="receipt_original"):
+            # The original is only fetched on request
+            st.image(selected_receipt.image_data)
+        
+        # Display OCR text in an expander
+        with st.expander("View OCR Text"):
+            st.text(selected_receipt.ocr_text)
+            if selected_receipt.entities:
+                st.dataframe([
+                    {"Entity": entity["label"], "Text": entity["text"], "Score": entity["score"]}
+                    for entity in selected_receipt.entities
+                ], hide_index=True)
     else:
         st.info("No receipts found for this customer. Upload a receipt in the 'Receipt Upload' page.")
         
@@ -990,20 +3650,27 @@ Total: $8.47""")
 def show_recommendations(system):
     st.markdown("<h2 class='subheader'>Food Recommendations</h2>", unsafe_allow_html=True)
     
-    if not system.customers:
+    if not system.count_customers():
         st.warning("Please register a customer first!")
         return
     
+    show_panel(recommendations_panel, system)
+
+def recommendations_panel(system):
+    """Customer selection and their recommendations"""
+    sync_completed_jobs(system)
+    
     col1, col2 = st.columns([1, 2])
+    max_distance_km = None
     
     with col1:
         st.markdown("<div class='card'>", unsafe_allow_html=True)
         st.markdown("### Customer Selection")
         
         # Customer selection
-        customer_emails = [c.email for c in system.customers]
+        customer_emails = system.customer_emails()
         selected_email = st.selectbox("Select Customer", customer_emails)
-        selected_customer = next((c for c in system.customers if c.email == selected_email), None)
+        selected_customer = system.get_customer_by_email(selected_email)
         
         if selected_customer:
             st.markdown("#### Customer Profile")
@@ -1011,24 +3678,20 @@ def show_recommendations(system):
             st.write(f"Email: {selected_customer.email}")
             
             st.markdown("#### Favorite Foods")
-            favorite_html = ""
-            for food in selected_customer.favorite_food:
-                favorite_html += f'<span class="badge badge-green">{food}</span>'
-            st.markdown(favorite_html, unsafe_allow_html=True)
+            favorite_foods = selected_customer.favorite_food
+            st.markdown(render_badges(favorite_foods, highlighted=favorite_foods), unsafe_allow_html=True)
             
             st.markdown("#### Recently Purchased Ingredients")
-            if selected_customer.customer_id in system.receipts and system.receipts[selected_customer.customer_id]:
-                all_ingredients = set()
-                for receipt in system.receipts[selected_customer.customer_id]:
-                    all_ingredients.update(receipt.ingredients)
-                
-                ingredient_html = ""
-                for ingredient in all_ingredients:
-                    ingredient_html += f'<span class="badge badge-blue">{ingredient}</span>'
-                st.markdown(ingredient_html, unsafe_allow_html=True)
+            all_ingredients = system.purchased_ingredients(selected_customer.customer_id)
+            if all_ingredients:
+                st.markdown(render_badges(sorted(all_ingredients)), unsafe_allow_html=True)
             else:
                 st.info("No receipts uploaded yet!")
             
+            if selected_customer.location:
+                max_distance = st.number_input("Max store distance (km, 0 for any)", min_value=0.0, value=0.0, step=1.0)
+                max_distance_km = max_distance or None
+            
             if st.button("Get Recommendations"):
                 st.session_state['show_recommendations'] = True
         
@@ -1036,44 +3699,40 @@ def show_recommendations(system):
     
     with col2:
         if 'show_recommendations' in st.session_state and st.session_state['show_recommendations'] and selected_customer:
-            recommendations = system.get_recommendations(selected_customer)
+            recommendations = system.get_recommendations(selected_customer, max_distance_km=max_distance_km)
             
             if recommendations:
                 # Display recommendations as a modern product list
                 st.markdown("### Recommended Items")
                 
+                favorite_foods = selected_customer.favorite_food
+                cards = []
                 for item in recommendations:
-                    st.markdown(f"""
-                    <div class="product-card">
-                        <img src="https://cdn-icons-png.flaticon.com/512/1147/1147805.png" class="product-image">
-                        <div class="product-details">
-                            <div class="product-name">{item.name}</div>
-                            <div style="color: #2E7D32; font-weight: bold; margin-bottom: 5px;">${item.price:.2f}</div>
-                    """, unsafe_allow_html=True)
-                    
-                    ingredient_html = ""
-                    for ingredient in item.ingredients:
-                        if ingredient in selected_customer.favorite_food:
-                            ingredient_html += f'<span class="badge badge-green">{ingredient}</span>'
-                        else:
-                            ingredient_html += f'<span class="badge badge-blue">{ingredient}</span>'
-                    st.markdown(ingredient_html, unsafe_allow_html=True)
-                    
-                    st.markdown("</div></div>", unsafe_allow_html=True)
-                    
+                    notes = []
                     # Show why this item was recommended
-                    if selected_customer.favorite_food:
-                        matching_ingredients = [food for food in selected_customer.favorite_food if food in item.ingredients]
-                        if matching_ingredients:
-                            st.markdown(f"✓ **Contains your favorite:** {', '.join(matching_ingredients)}")
+                    matching_ingredients = [food for food in favorite_foods if food in item.ingredients]
+                    if matching_ingredients:
+                        notes.append(f"✓ Contains your favorite: {', '.join(matching_ingredients)}")
                     
                     # Find store
-                    store = next((s for s in system.stores if any(mi.item_id == item.item_id for mi in s.menu_items)), None)
-                    if store:
-                        st.write(f"**Available at:** {store.name}")
-                        st.button(f"Add to Cart", key=f"add_{item.item_id}")
+                    store = system.get_store_for_item(item.item_id)
+                    if store and selected_customer.location:
+                        distance = haversine_km(*selected_customer.location, *store.location)
+                        notes.append(f"Available at: {store.name} ({distance:.1f} km)")
+                    elif store:
+                        notes.append(f"Available at: {store.name}")
+                    cards.append(render_menu_item(item, system.catalog_version, favorite_foods, tuple(notes)))
+                st.markdown("".join(cards), unsafe_allow_html=True)
+                
+                cart_item = st.selectbox("Item", recommendations, format_func=lambda item: item.name, key="recommended_item")
+                if st.button("Add to Cart", key="add_recommended_item"):
+                    st.toast(f"Added {cart_item.name} to your cart")
             else:
                 st.info("No recommendations available at this time.")
+            
+            cache_stats = system.recommendation_cache.stats()
+            st.caption(f"Recommendation cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                       f"({cache_stats['hit_rate']:.0%} hit rate)")
         else:
             # Show a demo recommendation
             st.markdown("### Sample Recommendations")
@@ -1093,13 +3752,7 @@ def show_recommendations(system):
                         <div style="color: #2E7D32; font-weight: bold; margin-bottom: 5px;">${item["price"]:.2f}</div>
                 """, unsafe_allow_html=True)
                 
-                ingredient_html = ""
-                for ingredient in item["ingredients"]:
-                    if ingredient in item["favorite"]:
-                        ingredient_html += f'<span class="badge badge-green">{ingredient}</span>'
-                    else:
-                        ingredient_html += f'<span class="badge badge-blue">{ingredient}</span>'
-                st.markdown(ingredient_html, unsafe_allow_html=True)
+                st.markdown(render_badges(item["ingredients"], item["favorite"]), unsafe_allow_html=True)
                 
                 st.markdown("</div></div>", unsafe_allow_html=True)
                 
@@ -1111,24 +3764,35 @@ def show_recommendations(system):
 def show_store_marketplace(system):
     st.markdown("<h2 class='subheader'>Store Marketplace</h2>", unsafe_allow_html=True)
     
+    show_panel(store_marketplace_panel, system)
+
+def store_marketplace_panel(system):
+    """Store search, paging and the selected store's menu"""
     col1, col2 = st.columns([1, 1])
     
     with col1:
         # Display all available stores
         st.markdown("### Available Stores")
         
-        for store in system.stores:
-            with st.container():
-                st.markdown(f"""
-                <div class='card'>
-                    <h3>{store.name}</h3>
-                    <p><strong>Location:</strong> {store.location[0]}, {store.location[1]}</p>
-                    <p><strong>Available Items:</strong> {len(store.menu_items)}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if st.button(f"View {store.name}", key=f"view_{store.store_id}"):
-                    st.session_state['selected_store'] = store.store_id
+        # Sort by distance from a customer who shared their location
+        near_email = st.selectbox("Stores near", ["Any location"] + system.customer_emails(located=True))
+        near_customer = system.get_customer_by_email(near_email)
+        query = st.text_input("Search stores", placeholder="Store name starts with...")
+        
+        # Only the stores on the current page are looked up and rendered
+        page_size = 10
+        near = near_customer.location if near_customer else None
+        offset = show_page_selector(system.count_stores(query), page_size, key="stores_page", noun="stores")
+        stores = system.list_stores(offset, page_size, query, near)
+        
+        st.markdown("".join(render_store_card(store, system.catalog_version, distance) for distance, store in stores),
+                    unsafe_allow_html=True)
+        
+        if stores:
+            view_store = st.selectbox("Store", [store for _, store in stores], format_func=lambda store: store.name,
+                                      key="view_store")
+            if st.button(f"View {view_store.name}", key="view_store_button"):
+                st.session_state['selected_store'] = view_store.store_id
     
     with col2:
         # Show the store catalog selection interface (similar to Image 3)
@@ -1170,26 +3834,25 @@ def show_store_marketplace(system):
         # Check if a store is selected to display its details
         selected_store_id = st.session_state.get('selected_store')
         if selected_store_id:
-            selected_store = next((s for s in system.stores if s.store_id == selected_store_id), None)
+            selected_store = system.get_store(selected_store_id)
             if selected_store:
                 st.markdown(f"### {selected_store.name} Menu Items")
                 
-                for item in selected_store.menu_items:
-                    st.markdown(f"""
-                    <div class="product-card">
-                        <img src="https://cdn-icons-png.flaticon.com/512/1147/1147805.png" class="product-image">
-                        <div class="product-details">
-                            <div class="product-name">{item.name}</div>
-                            <div style="color: #2E7D32; font-weight: bold; margin-bottom: 5px;">${item.price:.2f}</div>
-                    """, unsafe_allow_html=True)
-                    
-                    ingredient_html = ""
-                    for ingredient in item.ingredients:
-                        ingredient_html += f'<span class="badge badge-blue">{ingredient}</span>'
-                    st.markdown(ingredient_html, unsafe_allow_html=True)
-                    
-                    st.markdown("</div></div>", unsafe_allow_html=True)
-                    st.button(f"Add {item.name} to Cart", key=f"cart_{item.item_id}")
+                page_size = 10
+                offset = show_page_selector(len(selected_store.menu_items), page_size,
+                                            key=f"menu_page_{selected_store.store_id}", noun="menu items")
+                menu_items = selected_store.menu_items[offset:offset + page_size]
+                st.markdown("".join(render_menu_item(item, system.catalog_version) for item in menu_items),
+                            unsafe_allow_html=True)
+                
+                if menu_items:
+                    cart_item = st.selectbox("Item", menu_items, format_func=lambda item: item.name, key="store_item")
+                    if st.button(f"Add {cart_item.name} to Cart", key="add_store_item"):
+                        st.toast(f"Added {cart_item.name} to your cart")
+
+if "app module" not in _process.timings:
+    _process.timings["app module"] = time.perf_counter() - _module_started
+    logger.info("Loaded app module in %.2fs", _process.timings["app module"])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
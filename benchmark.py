@@ -0,0 +1,291 @@
+"""
+Benchmarks for the ReceiptSystem hot paths on seeded synthetic data.
+
+    python benchmark.py --scales small,medium --output benchmark.json
+
+Each benchmark reports throughput, latency percentiles and peak traced
+memory per scale. Results are written as JSON so runs from different
+commits can be compared.
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import List, Optional
+
+import app
+
+# Dataset sizes for each scale
+SCALES = {
+    "small": {"customers": 100, "stores": 10, "items_per_store": 20, "receipts_per_customer": 3, "vocabulary_size": 200},
+    "medium": {"customers": 1000, "stores": 100, "items_per_store": 20, "receipts_per_customer": 3, "vocabulary_size": 1000},
+    "large": {"customers": 10000, "stores": 1000, "items_per_store": 20, "receipts_per_customer": 3, "vocabulary_size": 5000}
+}
+
+# City centres stores and customers cluster around
+CITIES = [(13.7563, 100.5018), (18.7883, 98.9853), (40.7128, -74.0060), (51.5074, -0.1278)]
+
+class SyntheticData:
+    """
+    Seeded generator for customers, stores and receipts. Ingredient
+    popularity follows a Zipf distribution over the vocabulary, with the
+    ingredients the receipt matcher knows about as the most popular ones,
+    and a few customers upload most of the receipts.
+    """
+    def __init__(self, seed: int = 0, vocabulary_size: int = 1000, zipf_exponent: float = 1.1):
+        self.random = random.Random(seed)
+        known = list(app.INGREDIENT_LEXICON)
+        self.vocabulary = known + [f"ingredient-{i}" for i in range(max(0, vocabulary_size - len(known)))]
+        self.weights = [1 / rank ** zipf_exponent for rank in range(1, len(self.vocabulary) + 1)]
+        self.receipt_weights = self.weights[:len(known)]
+        self.image_data = app.create_sample_image()
+
+    def ingredients(self, count: int, vocabulary: Optional[List[str]] = None, weights=None) -> List[str]:
+        """Draw up to count distinct ingredients, skewed towards popular ones"""
+        vocabulary = vocabulary or self.vocabulary
+        weights = weights or self.weights
+        drawn = self.random.choices(vocabulary, weights, k=count)
+        return list(dict.fromkeys(drawn))
+
+    def location(self) -> tuple:
+        lat, lon = self.random.choice(CITIES)
+        return (round(lat + self.random.gauss(0, 0.1), 6), round(lon + self.random.gauss(0, 0.1), 6))
+
+    def stores(self, count: int, items_per_store: int) -> List[app.Store]:
+        stores = []
+        for store_number in range(count):
+            menu_items = [
+                app.MenuItem(
+                    item_id=f"M{store_number}-{item_number}",
+                    name=" ".join(self.random.choices(string.ascii_lowercase, k=2)).title() + f" {item_number}",
+                    ingredients=self.ingredients(self.random.randint(2, 6)),
+                    price=round(self.random.uniform(2, 25), 2)
+                )
+                for item_number in range(items_per_store)
+            ]
+            name = "".join(self.random.choices(string.ascii_lowercase, k=8)).title()
+            stores.append(app.Store(f"S{store_number}", f"{name} Market", self.location(), menu_items))
+        return stores
+
+    def customers(self, count: int) -> List[app.Customer]:
+        return [
+            app.Customer(
+                customer_id=f"C{number}",
+                email=f"customer{number}@example.com",
+                birthdate=datetime(1950, 1, 1) + timedelta(days=self.random.randint(0, 20000)),
+                gender=self.random.choice(["Female", "Male", "Other"]),
+                address=f"{number} Synthetic Rd",
+                favorite_food=self.ingredients(self.random.randint(0, 4)),
+                location=self.location() if self.random.random() < 0.8 else None
+            )
+            for number in range(count)
+        ]
+
+    def receipt_counts(self, customers: List[app.Customer], mean: float) -> List[int]:
+        """Receipts per customer, Pareto distributed with the given mean"""
+        alpha = 2.0  # Mean of paretovariate(alpha) - 1 is 1 / (alpha - 1)
+        return [int(mean * (self.random.paretovariate(alpha) - 1) * (alpha - 1) + 0.5) for _ in customers]
+
+    def receipt(self, receipt_id: str) -> app.Receipt:
+        """A new, unprocessed receipt whose OCR text names a few ingredients"""
+        upload_date = datetime(2025, 1, 1) + timedelta(minutes=self.random.randint(0, 525600))
+        lines = [f"Receipt #{receipt_id}", f"Date: {upload_date.strftime('%Y-%m-%d')}", "Items:"]
+        for ingredient in self.ingredients(self.random.randint(2, 6), list(app.INGREDIENT_LEXICON), self.receipt_weights):
+            name = self.random.choice(app.INGREDIENT_LEXICON[ingredient])
+            lines.append(f"- {name.capitalize()} ${self.random.uniform(0.5, 15):.2f}")
+        return app.Receipt(receipt_id, upload_date, self.image_data, "\n".join(lines), [], 1, upload_date)
+
+def build_system(data: SyntheticData, scale: dict) -> app.ReceiptSystem:
+    """A populated system. Receipts get a cheap analysis so large scales build quickly."""
+    system = app.ReceiptSystem()
+    for store in data.stores(scale["stores"], scale["items_per_store"]):
+        system.add_store(store)
+    customers = data.customers(scale["customers"])
+    for customer in customers:
+        system.register_customer(customer)
+
+    table = app.get_shelf_life_table()
+    for customer, count in zip(customers, data.receipt_counts(customers, scale["receipts_per_customer"])):
+        for number in range(count):
+            receipt = data.receipt(f"R{customer.customer_id}-{number}")
+            ingredients = app.get_ingredient_matcher().extract(receipt.ocr_text)
+            expiry_dates = table.expiry_dates([receipt.upload_date] * len(ingredients), ingredients).tolist()
+            system.apply_analysis(receipt, {
+                "ocr_text": receipt.ocr_text,
+                "ingredients": ingredients,
+                "shelf_life": min(expiry_dates, default=receipt.upload_date),
+                "ingredient_expiry": dict(zip(ingredients, expiry_dates)),
+                "thumbnails": {}
+            }, customer.customer_id)
+    system.clear_changes()
+    return system
+
+def bench_register_customer(data: SyntheticData, scale: dict):
+    system = app.ReceiptSystem()
+    return [lambda customer=customer: system.register_customer(customer) for customer in data.customers(scale["customers"])]
+
+def bench_add_store(data: SyntheticData, scale: dict):
+    system = app.ReceiptSystem()
+    return [lambda store=store: system.add_store(store) for store in data.stores(scale["stores"], scale["items_per_store"])]
+
+def bench_process_receipt(data: SyntheticData, scale: dict, max_receipts: int = 200):
+    system = app.ReceiptSystem()
+    customers = data.customers(min(scale["customers"], 100))
+    for customer in customers:
+        system.register_customer(customer)
+    receipts = [(data.receipt(f"P{number}"), data.random.choice(customers).customer_id)
+                for number in range(min(max_receipts, scale["customers"] * scale["receipts_per_customer"]))]
+    return [lambda receipt=receipt, customer_id=customer_id: system.process_receipt(receipt, customer_id)
+            for receipt, customer_id in receipts]
+
+def bench_get_recommendations(data: SyntheticData, scale: dict, system: app.ReceiptSystem, max_calls: int = 1000):
+    """Cold calls: each customer is asked once, after the cache was cleared"""
+    system.recommendation_cache.clear()
+    customers = data.random.sample(system.customers, min(max_calls, len(system.customers)))
+    return [lambda customer=customer: system.get_recommendations(customer) for customer in customers]
+
+def bench_get_recommendations_cached(data: SyntheticData, scale: dict, system: app.ReceiptSystem, max_calls: int = 1000):
+    """Warm calls over a working set that fits in the recommendation cache"""
+    hot = data.random.sample(system.customers, min(system.recommendation_cache.maxsize, len(system.customers)))
+    customers = [data.random.choice(hot) for _ in range(max_calls)]
+    for customer in hot:
+        system.get_recommendations(customer)
+    return [lambda customer=customer: system.get_recommendations(customer) for customer in customers]
+
+def bench_to_dict(data: SyntheticData, scale: dict, system: app.ReceiptSystem, repeat: int = 3):
+    return [system.to_dict] * repeat
+
+def bench_from_dict(data: SyntheticData, scale: dict, system: app.ReceiptSystem, repeat: int = 3):
+    snapshot = system.to_dict()
+    return [lambda: app.ReceiptSystem.from_dict(snapshot)] * repeat
+
+# Benchmarks that build their own system, then those that run against a populated one
+FRESH_BENCHMARKS = {
+    "register_customer": bench_register_customer,
+    "add_store": bench_add_store,
+    "process_receipt": bench_process_receipt
+}
+POPULATED_BENCHMARKS = {
+    "get_recommendations": bench_get_recommendations,
+    "get_recommendations_cached": bench_get_recommendations_cached,
+    "to_dict": bench_to_dict,
+    "from_dict": bench_from_dict
+}
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+def measure(calls) -> dict:
+    """Time each call, then report latency percentiles in milliseconds and throughput"""
+    latencies = []
+    started = time.perf_counter()
+    for call in calls:
+        call_started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "count": len(latencies),
+        "total_s": total,
+        "ops_per_s": len(latencies) / total if total else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+def measure_peak_memory(calls) -> float:
+    """Peak traced memory in MB while running the calls. Done separately since tracing slows them down."""
+    tracemalloc.start()
+    try:
+        for call in calls:
+            call()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def run_scale(name: str, scale: dict, seed: int, benchmarks: List[str]) -> List[dict]:
+    results = []
+
+    def record(benchmark: str, build):
+        # Build the calls twice from the same seed: once for timing, once for memory
+        result = {"scale": name, "benchmark": benchmark, **measure(build(seed))}
+        result["peak_memory_mb"] = measure_peak_memory(build(seed))
+        results.append(result)
+        print(f"{name:>8} {benchmark:<28} {result['count']:>7} ops {result['ops_per_s']:>11.1f} ops/s "
+              f"p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms  peak {result['peak_memory_mb']:>8.1f} MB",
+              flush=True)
+
+    for benchmark, factory in FRESH_BENCHMARKS.items():
+        if benchmark in benchmarks:
+            record(benchmark, lambda seed, factory=factory: factory(
+                SyntheticData(seed, scale["vocabulary_size"]), scale))
+
+    populated = [benchmark for benchmark in POPULATED_BENCHMARKS if benchmark in benchmarks]
+    if populated:
+        data = SyntheticData(seed, scale["vocabulary_size"])
+        system = build_system(data, scale)
+        for benchmark in populated:
+            factory = POPULATED_BENCHMARKS[benchmark]
+            record(benchmark, lambda seed, factory=factory: factory(
+                SyntheticData(seed + 1, scale["vocabulary_size"]), scale, system))
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated scales from {', '.join(SCALES)}")
+    parser.add_argument("--benchmarks", default=",".join([*FRESH_BENCHMARKS, *POPULATED_BENCHMARKS]),
+                        help="Comma-separated benchmarks to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="Where to write the JSON results")
+    args = parser.parse_args(argv)
+
+    scales = args.scales.split(",")
+    benchmarks = args.benchmarks.split(",")
+    unknown = [scale for scale in scales if scale not in SCALES] + \
+              [benchmark for benchmark in benchmarks if benchmark not in FRESH_BENCHMARKS and benchmark not in POPULATED_BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown scales or benchmarks: {', '.join(unknown)}")
+
+    # Keep images in memory and load the matcher up front so neither skews the timings
+    app.set_blob_store(app.BlobStore())
+    app.get_ingredient_matcher()
+    random.seed(args.seed)
+
+    results = []
+    for scale in scales:
+        results.extend(run_scale(scale, SCALES[scale], args.seed, benchmarks))
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "scales": {scale: SCALES[scale] for scale in scales},
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}")
+
+if __name__ == "__main__":
+    main()